@@ -0,0 +1,207 @@
+from Backend.Memory import Embed, Dimensions
+from dotenv import dotenv_values
+import numpy as np
+import threading
+import sqlite3
+import time
+import re
+import os
+
+env_vars = dotenv_values(".env")
+AnswerCacheEnabled = env_vars.get("AnswerCache", "True").lower() == "true"
+Threshold = float(env_vars.get("AnswerCacheThreshold", 0.35))
+# Content words one key may add over the other and still count as a paraphrase
+MaxExtraWords = 2
+MaxEntries = 500
+MaxAge = 30 * 24 * 3600
+
+# Words that carry no topic; dropping them lets "what is python" and
+# "tell me about python" land on the same vector
+FillerWords = {
+    "a", "an", "the", "of", "is", "are", "was", "were", "what", "who", "how", "to", "do", "does", "i",
+    "me", "tell", "about", "please", "can", "could", "you", "explain", "describe", "define", "s", "whats",
+}
+# Queries that lean on the conversation so far cannot be answered from a cache
+ContextWords = re.compile(
+    r"\b(it|its|that|this|those|these|he|she|him|her|they|them|their|my|mine|our|we|us|"
+    r"again|more|above|previous|earlier|last|same|else|instead)\b"
+)
+
+
+def KeyText(query):
+    words = re.findall(r"[a-z0-9]+", query.lower().replace("'s", ""))
+    return " ".join(word for word in words if word not in FillerWords)
+
+def Compatible(key, other):
+    # Similarity alone cannot tell a paraphrase from a different question,
+    # so the keys must also agree on structure:
+    # - the numbers are identical, in order ("15 times 12" vs "12 times 15", "python 3")
+    # - one key's words all appear in the other, which adds at most
+    #   MaxExtraWords ("python" vs "python programming language", but not
+    #   "capital france" vs "capital germany")
+    # - the shared words come in the same order ("celsius to fahrenheit")
+    words, others = key.split(), other.split()
+    if [w for w in words if w.isdigit()] != [w for w in others if w.isdigit()]:
+        return False
+    shorter, longer = sorted((set(words), set(others)), key=len)
+    if not shorter <= longer or len(longer) - len(shorter) > MaxExtraWords:
+        return False
+    return [w for w in words if w in shorter] == [w for w in others if w in shorter]
+
+def KeyVector(key):
+    return Embed(key, bigrams=True)
+
+def DependsOnContext(query):
+    return bool(ContextWords.search(query.lower()))
+
+
+# Answers to general queries, looked up by embedding similarity. Vectors are
+# held in one NumPy matrix for a brute-force scan; entries persist in SQLite
+# and the least recently used ones are evicted past max_entries.
+class AnswerCache:
+    def __init__(self, path=os.path.join("Data", "AnswerCache.db"), max_entries=MaxEntries,
+                 threshold=Threshold, max_age=MaxAge):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        with self.db:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, query TEXT, answer TEXT, created REAL, used REAL)"
+            )
+            self.db.execute("DELETE FROM answers WHERE created < ?", (time.time() - max_age,))
+        self.keys = [row[0] for row in self.db.execute("SELECT key FROM answers")]
+        self.vectors = np.array([KeyVector(key) for key in self.keys], dtype=np.float32).reshape(-1, Dimensions)
+
+    def _match(self, key):
+        if not self.keys:
+            return None
+        # Similarity ranks the candidates; the first one that is also
+        # structurally compatible is the hit
+        scores = self.vectors @ KeyVector(key)
+        for best in np.argsort(-scores)[:10]:
+            if scores[best] < self.threshold:
+                break
+            if Compatible(key, self.keys[best]):
+                return int(best)
+        return None
+
+    def _lookup(self, key):
+        best = self._match(key)
+        if best is None:
+            return None, None
+        row = self.db.execute("SELECT answer, created FROM answers WHERE key = ?", (self.keys[best],)).fetchone()
+        if row is None or time.time() - row[1] > self.max_age:
+            return None, None
+        return self.keys[best], row[0]
+
+    def get(self, query):
+        if not AnswerCacheEnabled:
+            return None
+        key = KeyText(query)
+        if not key:
+            return None
+        with self.lock:
+            match, answer = self._lookup(key)
+            if match is None:
+                self.misses += 1
+                return None
+            with self.db:
+                self.db.execute("UPDATE answers SET used = ? WHERE key = ?", (time.time(), match))
+            self.hits += 1
+            return answer
+
+    def contains(self, query):
+        # Lookup without touching statistics or recency
+        key = KeyText(query)
+        if not AnswerCacheEnabled or not key:
+            return False
+        with self.lock:
+            return self._lookup(key)[0] is not None
+
+    def put(self, query, answer):
+        if not AnswerCacheEnabled:
+            return
+        key = KeyText(query)
+        if not key or not answer:
+            return
+        now = time.time()
+        with self.lock:
+            if key not in self.keys:
+                self.keys.append(key)
+                self.vectors = np.vstack([self.vectors, KeyVector(key)[None, :]])
+            with self.db:
+                self.db.execute("INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?)", (key, query, answer, now, now))
+            self._evict()
+
+    def _evict(self):
+        excess = len(self.keys) - self.max_entries
+        if excess <= 0:
+            return
+        stale = [row[0] for row in self.db.execute("SELECT key FROM answers ORDER BY used LIMIT ?", (excess,))]
+        self._remove(stale)
+
+    def _remove(self, keys):
+        keys = set(keys)
+        if not keys:
+            return
+        with self.db:
+            self.db.executemany("DELETE FROM answers WHERE key = ?", [(key,) for key in keys])
+        keep = [i for i, key in enumerate(self.keys) if key not in keys]
+        self.keys = [self.keys[i] for i in keep]
+        self.vectors = self.vectors[keep]
+
+    def invalidate(self, query=None):
+        # Drops every entry similar to the query, or everything without one
+        with self.lock:
+            if query is None:
+                self._remove(self.keys)
+                return
+            key = KeyText(query)
+            if not key or not self.keys:
+                return
+            scores = self.vectors @ KeyVector(key)
+            self._remove(self.keys[i] for i in np.flatnonzero(scores >= self.threshold)
+                         if Compatible(key, self.keys[i]))
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.keys),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+answer_cache = AnswerCache()
+
+
+if __name__ == "__main__":
+    # Paraphrases of a cached question hit; questions that differ in numbers,
+    # word order or subject miss
+    import tempfile
+
+    cache = AnswerCache(path=os.path.join(tempfile.mkdtemp(), "AnswerCache.db"))
+    for query in ("what is python", "convert celsius to fahrenheit", "what is 15 times 12", "capital of france"):
+        cache.put(query, f"answer to {query}")
+    cases = {
+        "what's python programming language": "what is python",
+        "what is the python language": "what is python",
+        "tell me about python": "what is python",
+        "what is python 3": None,
+        "convert fahrenheit to celsius": None,
+        "what is 12 times 15": None,
+        "capital of germany": None,
+    }
+    for query, expected in cases.items():
+        answer = cache.get(query)
+        assert answer == (expected and f"answer to {expected}"), f"{query!r} -> {answer!r}"
+        print(f"{query!r}: {'hit' if answer else 'miss'}")
+    print(cache.stats())
@@ -0,0 +1,103 @@
+from collections import OrderedDict
+import threading
+import hashlib
+import os
+
+
+# Content-addressed cache of synthesized speech. A small in-memory hot tier
+# sits in front of a size-bounded LRU directory of clips on disk.
+class AudioCache:
+    def __init__(self, directory, max_disk_bytes=64 * 1024 * 1024, max_memory_bytes=8 * 1024 * 1024):
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_bytes = max_memory_bytes
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.disk = OrderedDict()
+        self.disk_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        # Rebuild the LRU order from modification times left by earlier runs
+        entries = []
+        for name in os.listdir(directory):
+            if name.endswith(".mp3"):
+                stat = os.stat(os.path.join(directory, name))
+                entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self.disk[key] = size
+            self.disk_bytes += size
+
+    @staticmethod
+    def key(text, voice, pitch, rate):
+        return hashlib.sha256("\0".join((text, str(voice), pitch, rate)).encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.mp3")
+
+    def get(self, key):
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return self.memory[key]
+            if key not in self.disk:
+                self.misses += 1
+                return None
+            try:
+                with open(self.path(key), "rb") as file:
+                    audio = file.read()
+                os.utime(self.path(key))
+            except OSError:
+                self.disk_bytes -= self.disk.pop(key)
+                self.misses += 1
+                return None
+            self.disk.move_to_end(key)
+            self.hits += 1
+            self.disk_hits += 1
+            self._remember(key, audio)
+            return audio
+
+    def put(self, key, audio):
+        if not audio:
+            return
+        with self.lock:
+            self._remember(key, audio)
+            try:
+                with open(self.path(key), "wb") as file:
+                    file.write(audio)
+            except OSError as e:
+                print(f"Error writing audio cache: {e}")
+                return
+            self.disk_bytes += len(audio) - self.disk.pop(key, 0)
+            self.disk[key] = len(audio)
+            while self.disk_bytes > self.max_disk_bytes and len(self.disk) > 1:
+                old_key, size = self.disk.popitem(last=False)
+                self.disk_bytes -= size
+                try:
+                    os.remove(self.path(old_key))
+                except OSError:
+                    pass
+
+    def _remember(self, key, audio):
+        if key in self.memory:
+            self.memory_bytes -= len(self.memory.pop(key))
+        self.memory[key] = audio
+        self.memory_bytes += len(audio)
+        while self.memory_bytes > self.max_memory_bytes and len(self.memory) > 1:
+            _, old = self.memory.popitem(last=False)
+            self.memory_bytes -= len(old)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "memory_bytes": self.memory_bytes,
+            "disk_bytes": self.disk_bytes,
+        }
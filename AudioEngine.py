@@ -0,0 +1,149 @@
+import collections
+import threading
+import io
+
+# Imported by AudioEngine.start(); pygame is slow to load and opens the mixer
+pygame = None
+EndEvent = None
+PollInterval = 0.01
+
+
+class Playback:
+    def __init__(self, sound):
+        self.sound = sound
+        self.length = sound.get_length()
+        self.started = threading.Event()
+        self.done = threading.Event()
+        self.interrupted = False
+
+    def wait(self, timeout=None):
+        self.done.wait(timeout)
+        return not self.interrupted
+
+    def finish(self, interrupted=False):
+        if self.done.is_set():
+            return
+        self.interrupted = interrupted
+        self.started.set()
+        self.done.set()
+
+
+# Long-lived audio output: the mixer is initialised once, clips are decoded
+# from in-memory buffers, and queued clips are handed to the channel's own
+# one-slot queue so they play back to back without a gap. Completion comes
+# from the channel itself (its end event), never from clip-length estimates,
+# since actual output lags by the mixer buffer. Callers wait on per-clip
+# events instead of polling the mixer.
+class AudioEngine:
+    def __init__(self, frequency=24000, buffer=512):
+        self.frequency = frequency
+        self.buffer = buffer
+        self.channel = None
+        self.pending = collections.deque()
+        self.playing = None
+        self.queued = None
+        self.events = False
+        self.condition = threading.Condition()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self):
+        global pygame, EndEvent
+        with self.lock:
+            if self.thread is None:
+                import pygame
+                # edge-tts produces 24 kHz mono; matching it avoids resampling
+                pygame.mixer.pre_init(frequency=self.frequency, channels=1, buffer=self.buffer)
+                pygame.mixer.init()
+                self.channel = pygame.mixer.Channel(0)
+                EndEvent = pygame.USEREVENT + 7
+                # End events go through SDL's event queue, which belongs to the
+                # video subsystem. Without it the channel state is read instead.
+                try:
+                    if not pygame.display.get_init():
+                        pygame.display.init()
+                    self.channel.set_endevent(EndEvent)
+                    self.events = True
+                except pygame.error:
+                    self.events = False
+                self.thread = threading.Thread(target=self._run, daemon=True, name="AudioEngine")
+                self.thread.start()
+
+    def decode(self, audio):
+        self.start()
+        return pygame.mixer.Sound(file=io.BytesIO(audio))
+
+    def enqueue(self, audio):
+        # Decoding happens on the caller's thread, ahead of playback
+        playback = Playback(self.decode(audio))
+        with self.condition:
+            self.pending.append(playback)
+            self.condition.notify()
+        return playback
+
+    def play(self, audio):
+        return self.enqueue(audio).wait()
+
+    def stop(self):
+        with self.condition:
+            if self.channel is None:
+                return
+            self.channel.stop()
+            for playback in [self.playing, self.queued, *self.pending]:
+                if playback is not None:
+                    playback.finish(interrupted=True)
+            self.pending.clear()
+            self.playing = self.queued = None
+            # Stopping posts an end event of its own
+            self._ended()
+
+    def _ended(self):
+        # How many clips have finished since the last call
+        if self.events:
+            return len(pygame.event.get(EndEvent, pump=False))
+        if self.playing is None:
+            return 0
+        if not self.channel.get_busy():
+            return 2 if self.queued is not None else 1
+        if self.queued is not None and self.channel.get_sound() is self.queued.sound:
+            return 1
+        return 0
+
+    def _advance(self):
+        for _ in range(self._ended()):
+            if self.playing is None:
+                break
+            self.playing.finish()
+            # The queued clip is what the channel is playing now
+            self.playing, self.queued = self.queued, None
+            if self.playing is not None:
+                self.playing.started.set()
+
+    def _feed(self):
+        while self.pending and self.queued is None:
+            playback = self.pending.popleft()
+            if playback.done.is_set():
+                continue
+            if self.playing is None:
+                self.channel.play(playback.sound)
+                self.playing = playback
+                playback.started.set()
+            elif self.channel.get_queue() is None:
+                # Channel.queue replaces whatever is already queued, so only
+                # hand over a clip while the slot is actually free
+                self.channel.queue(playback.sound)
+                self.queued = playback
+            else:
+                self.pending.appendleft(playback)
+                break
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self._advance()
+                self._feed()
+                # Completion is only checked for while something is playing
+                self.condition.wait(PollInterval if self.playing is not None else None)
+
+
+engine = AudioEngine()
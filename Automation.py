@@ -4,6 +4,8 @@ from pywhatkit import playonyt
 from dotenv import dotenv_values
 from bs4 import BeautifulSoup
 from rich import print
+from Backend.Providers import Groq
+from Backend.Resilience import Call
 import subprocess
 import requests
 import keyboard
@@ -22,34 +24,6 @@ if not GroqAPIKey:
 # User agent for web scraping fallback
 useragent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebkit/537.36 (KHTML, like Gecko) Chrome/100.0.4896.75 Safari/537.36'
 
-# Groq API wrapper
-class Groq:
-    def __init__(self, api_key):
-        self.api_key = api_key
-        self.base_url = "https://api.groq.com/openai/v1/chat/completions"
-
-    def chat_completion(self, model, messages, max_tokens=1024, temperature=0.7, top_p=1.0, stream=False):
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
-        data = {
-            "model": model,
-            "messages": messages,
-            "max_tokens": max_tokens,
-            "temperature": temperature,
-            "top_p": top_p,
-            "stream": stream,
-        }
-
-        # Debugging: Show request payload
-        print("[DEBUG] Sending payload to Groq API:", data)
-
-        response = requests.post(self.base_url, headers=headers, json=data)
-        response.raise_for_status()
-        return response.json()
-
-
 client = Groq(api_key=GroqAPIKey)
 
 # System instruction for the assistant
@@ -67,13 +41,13 @@ def Content(topic):
 
     def ContentWriterAI(prompt):
         messages = [{"role": "user", "content": prompt}]
-        completion = client.chat_completion(
+        completion = Call("groq", lambda: client.chat_completion(
             model="llama3-70b-8192",
             messages=SystemChatBot + messages,
             max_tokens=2048,
             temperature=0.7,
             top_p=1,
-        )
+        ), hedge=False, kind="content")
         answer = completion["choices"][0]["message"]["content"]
         return answer
 
@@ -1,33 +1,11 @@
-from json import load, dump
 import datetime
-import os
 import random
-import json
 from dotenv import dotenv_values
-import requests
-
-
-class Groq:
-    def __init__(self, api_key):
-        self.api_key = api_key
-        self.base_url = "https://api.groq.com/openai/v1/chat/completions"
-
-    def chat_completion(self, model, messages, max_tokens=1024, temperature=0.7, top_p=1.0, stream=False):
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
-        data = {
-            "model": model,
-            "messages": messages,
-            "max_tokens": max_tokens,
-            "temperature": temperature,
-            "top_p": top_p,
-            "stream": stream,
-        }
-        response = requests.post(self.base_url, headers=headers, json=data, stream=stream)
-        response.raise_for_status()
-        return response.iter_lines(decode_unicode=True) if stream else response.json()
+from Backend.Streaming import StreamChat, PrintToken, Publish
+from Backend.ConversationStore import store
+from Backend.ContextBuilder import BuildContext, summarizer
+from Backend.Memory import memory
+from Backend.AnswerCache import answer_cache, DependsOnContext
 
 
 # Load environment variables
@@ -36,25 +14,6 @@ Username = env_vars.get("Username")
 Assistantname = env_vars.get("Assistantname")
 GroqAPIKey = env_vars.get("GroqAPIKey")
 
-client = Groq(api_key=GroqAPIKey)
-
-# Initialize chat history
-chatlog_path = os.path.join("Data", "ChatLog.json")
-if not os.path.exists("Data"):
-    os.makedirs("Data")
-
-# Load or initialize chat history
-try:
-    with open(chatlog_path, "r") as f:
-        chat_history = load(f)
-    # Ensure chat_history is a list
-    if not isinstance(chat_history, list):
-        chat_history = []
-except (FileNotFoundError, json.JSONDecodeError):
-    chat_history = []
-    with open(chatlog_path, "w") as f:
-        dump(chat_history, f)
-
 System = f"""You are {Assistantname}, an advanced AI assistant. Follow these rules:
 1. Respond concisely unless asked to elaborate
 2. Always reply in English
@@ -89,93 +48,66 @@ def get_greeting_response():
     ]
     return random.choice(responses)
 
-def save_chat_history():
-    try:
-        with open(chatlog_path, "w") as f:
-            dump(chat_history, f, indent=4)
-    except Exception as e:
-        print(f"Error saving chat history: {e}")
+def Cacheable(query):
+    # Answers that depend on the clock or the conversation are never reused
+    return not is_time_query(query) and not DependsOnContext(query)
 
-def ChatBot(query):
-    global chat_history
-    
+def BuildMessages(query):
+    # System prompt, time info when asked for, then as much recent history as the budget allows
+    time_info = RealtimeInformation() if is_time_query(query) else None
+    return BuildContext(ChatParams["model"], ChatParams["max_tokens"], System, query, time_info=time_info)
+
+ChatParams = {"model": "llama3-70b-8192", "max_tokens": 1024, "temperature": 0.7, "top_p": 1}
+
+def ChatBot(query, on_token=None, draft=None):
     # Handle greetings separately
     if is_greeting(query):
         response = get_greeting_response()
         # Add to chat history
-        chat_history.extend([
-            {"role": "user", "content": query},
-            {"role": "assistant", "content": response}
-        ])
-        save_chat_history()
+        store.append_turn(query, response)
         print(response)
         return response
 
+    cacheable = Cacheable(query)
+    cached = answer_cache.get(query) if cacheable else None
+    if cached is not None:
+        # A near-duplicate was answered before; replay it without generating
+        if draft is not None:
+            draft.cancel()
+        PrintToken(cached, on_token)
+        Publish(cached)
+        Publish(None)
+        print()
+        store.append_turn(query, cached)
+        memory.remember_turn(query, cached)
+        return cached
+
     try:
-        # Prepare messages for API call
-        messages = [
-            {"role": "system", "content": System}
-        ]
-        
-        # Add time info if needed
-        if is_time_query(query):
-            messages.append({"role": "system", "content": RealtimeInformation()})
-        
-        # Add previous conversation history (last 6 exchanges)
-        messages.extend(chat_history[-12:])  # Keep last 6 exchanges (each has user+assistant messages)
-        
-        # Add current query
-        messages.append({"role": "user", "content": query})
-
-        # Get streaming response
-        stream_response = client.chat_completion(
-            model="llama3-70b-8192",
-            messages=messages,
-            max_tokens=1024,
-            temperature=0.7,
-            top_p=1,
-            stream=True,
-        )
-
-        answer = ""
-        for line in stream_response:
-            if line.strip():
-                if line.startswith("data: "):
-                    line = line[len("data: "):]
-                if line == "[DONE]":
-                    break
-
-                try:
-                    chunk = json.loads(line)
-                    if "choices" in chunk and chunk["choices"]:
-                        delta = chunk["choices"][0].get("delta", {})
-                        if "content" in delta:
-                            content_piece = delta["content"]
-                            print(content_piece, end="", flush=True)
-                            answer += content_piece
-                except json.JSONDecodeError:
-                    continue
+        if draft is not None and draft.matches(query):
+            # A speculative draft for this query is already streaming; take it over
+            answer = draft.adopt(lambda token: PrintToken(token, on_token))
+        else:
+            # Stream the response on the shared event loop
+            answer = StreamChat(
+                messages=BuildMessages(query),
+                on_token=lambda token: PrintToken(token, on_token),
+                **ChatParams,
+            )
 
         print()  # Newline after streaming
 
         # Update chat history
-        chat_history.extend([
-            {"role": "user", "content": query},
-            {"role": "assistant", "content": answer}
-        ])
-        
-        # Limit chat history to prevent excessive memory usage
-        if len(chat_history) > 20:  # Keep last 10 exchanges
-            chat_history = chat_history[-20:]
-        
-        save_chat_history()
+        store.append_turn(query, answer)
+        summarizer.schedule()
+        memory.remember_turn(query, answer)
+        if cacheable:
+            answer_cache.put(query, answer.strip())
         return answer.strip()
 
     except Exception as e:
         print(f"Error: {e}")
-        # Reset chat history on error
-        chat_history = []
-        save_chat_history()
+        # Reset the conversation context on error
+        store.clear_context()
         return "An error occurred. Please try again."
 
 if __name__ == "__main__":
@@ -0,0 +1,149 @@
+import threading
+import re
+
+# Local parser for the command verbs FirstLayerDMM and
+# Automation.TranslateAndExecute already know. It only answers when every
+# clause of the utterance matches the grammar; anything else returns None
+# and goes to the LLM as before.
+
+Fillers = re.compile(
+    r"^(?:(?:hey |ok |okay )?jarvis,? |please |can you |could you |would you |will you |kindly |just |now )+"
+)
+TrailingFillers = re.compile(r"(?: please| for me| now| jarvis)+$")
+ClauseSplit = re.compile(r"\s*(?:,|\band then\b|\bthen\b|\band\b|&)\s*")
+
+SystemCommands = {
+    "volume up": "volume up", "increase volume": "volume up", "increase the volume": "volume up",
+    "turn up the volume": "volume up", "turn the volume up": "volume up", "raise the volume": "volume up",
+    "volume down": "volume down", "decrease volume": "volume down", "decrease the volume": "volume down",
+    "lower the volume": "volume down", "turn down the volume": "volume down", "turn the volume down": "volume down",
+    "mute": "mute", "mute the volume": "mute", "mute volume": "mute",
+    "unmute": "unmute", "unmute the volume": "unmute", "unmute volume": "unmute",
+}
+
+Goodbyes = {"bye", "goodbye", "good bye", "bye bye", "see you", "see you later", "exit", "quit"}
+
+# Pronouns and vague objects need conversation context, so the LLM decides
+VagueTargets = {"it", "this", "that", "them", "these", "those", "something", "anything", "file", "the file"}
+
+# Any of these inside a target means the clause is about someone, not an app
+# or a song: "play a game with me", "open up to me about your day"
+Pronouns = {
+    "i", "me", "my", "mine", "you", "your", "yours", "we", "us", "our", "he", "him", "his",
+    "she", "her", "they", "them", "their", "it", "its", "this", "that", "these", "those",
+}
+# Verbs that mark a clause as its own instruction rather than a bare object
+# for the previous verb: "open my email and read it"
+ClauseVerbs = {
+    "open", "launch", "close", "kill", "play", "search", "look", "find", "read", "write", "send",
+    "tell", "show", "check", "reply", "make", "create", "generate", "draw", "set", "turn", "start",
+    "stop", "go", "get", "give", "call", "email", "text", "remind", "save", "delete", "explain",
+}
+MaxAppWords = 4
+
+VerbPatterns = [
+    (re.compile(r"^(?:open|launch) (?:up )?(?:the )?(.+?)(?: app| application| website)?$"), "open"),
+    (re.compile(r"^(?:close|kill) (?:the )?(.+?)(?: app| application| website)?$"), "close"),
+    (re.compile(r"^(?:search|look up) (?:for )?(.+?) on youtube$"), "youtube search"),
+    (re.compile(r"^youtube search (?:for )?(.+)$"), "youtube search"),
+    (re.compile(r"^(?:search|look up) (?:for )?(.+?) on google$"), "google search"),
+    (re.compile(r"^google(?: search)? (?:for )?(.+)$"), "google search"),
+    (re.compile(r"^(?:generate|create|make|draw) (?:an? )?(?:image|picture|photo) ((?:of|showing|with) .+)$"), "generate image"),
+    (re.compile(r"^play (.+?)(?: on youtube)?$"), "play"),
+]
+
+# Verbs whose object may be omitted in later clauses: "open chrome and firefox"
+CarryOverVerbs = {"open", "close"}
+
+
+def Normalize(prompt):
+    text = prompt.lower().strip()
+    text = re.sub(r"[.!?]+$", "", text).strip()
+    text = Fillers.sub("", text)
+    text = TrailingFillers.sub("", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def ValidTarget(verb, target):
+    if not target or target in VagueTargets:
+        return False
+    words = target.split()
+    if verb != "generate image" and Pronouns.intersection(words):
+        return False
+    # App and website names are short; anything longer is a sentence
+    return verb not in CarryOverVerbs or len(words) <= MaxAppWords
+
+
+def ParseClause(clause):
+    if clause in SystemCommands:
+        return "system", SystemCommands[clause]
+    for pattern, verb in VerbPatterns:
+        match = pattern.match(clause)
+        if match:
+            target = match.group(1).strip()
+            if not ValidTarget(verb, target):
+                return None
+            return verb, target
+    return None
+
+
+def ParseCommand(prompt):
+    text = Normalize(prompt)
+    if not text:
+        return None
+    if text in Goodbyes or re.fullmatch(r"(?:ok(?:ay)? )?(?:bye|goodbye)(?: jarvis)?", text):
+        return ["exit"]
+
+    decisions = []
+    verb = None
+    for clause in ClauseSplit.split(text):
+        clause = Normalize(clause)
+        if not clause:
+            continue
+        parsed = ParseClause(clause)
+        if parsed is None:
+            # A bare object inherits the previous verb, but only for short app
+            # names that carry no verb or pronoun of their own
+            words = clause.split()
+            if (verb in CarryOverVerbs and len(words) <= 3 and ValidTarget(verb, clause)
+                    and not ClauseVerbs.intersection(words)):
+                parsed = verb, clause
+            else:
+                return None
+        verb, target = parsed
+        decisions.append(f"{verb} {target}")
+    return decisions or None
+
+
+class FastPathStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.llm_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def hit(self):
+        with self.lock:
+            self.hits += 1
+
+    def miss(self, llm_seconds):
+        with self.lock:
+            self.misses += 1
+            self.llm_seconds += llm_seconds
+
+    def report(self):
+        with self.lock:
+            total = self.hits + self.misses
+            hit_rate = self.hits / total if total else 0.0
+            average = self.llm_seconds / self.misses if self.misses else 0.0
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": hit_rate,
+                "average_llm_seconds": average,
+                # Every hit skipped one LLM classification of roughly average cost
+                "seconds_saved": self.hits * average,
+            }
+
+
+stats = FastPathStats()
@@ -0,0 +1,212 @@
+from Backend.Providers import Groq
+from Backend.Resilience import Call
+from Backend.ConversationStore import store
+from Backend.Memory import memory
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from dotenv import dotenv_values
+import threading
+import json
+import os
+
+# tiktoken gives real BPE counts when installed; otherwise ~4 characters per token
+try:
+    import tiktoken
+    encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    encoding = None
+
+env_vars = dotenv_values(".env")
+
+# Prompt budgets in tokens, per model, excluding the completion
+ContextWindows = {"llama3-70b-8192": 8192, "llama3-8b-8192": 8192}
+PromptBudget = int(env_vars.get("PromptBudget", 3000))
+SummaryModel = "llama3-8b-8192"
+SummaryPath = os.path.join("Data", "ConversationSummary.json")
+# Turns newer than this are never summarized; they are what the budget fills first
+RecentTurns = 12
+SummaryBatch = 8
+# Transcript share of one summary prompt; leaves room for the summary and completion
+SummaryInputTokens = 4000
+# Share of the budget recalled long-term memories may take, and how many
+MemoryBudget = int(env_vars.get("MemoryBudget", 400))
+MemoryResults = 4
+# Upper bound on unsummarized turns offered to the budget if summaries fall behind
+MaxHistory = 40
+
+
+@lru_cache(maxsize=4096)
+def CountTokens(text):
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return len(text) // 4 + 1
+
+def MessageTokens(message):
+    # Role and separators add a few tokens per message
+    return CountTokens(message["content"]) + 4
+
+def ModelBudget(model, max_tokens):
+    window = ContextWindows.get(model, 8192)
+    return min(PromptBudget, window - max_tokens - 64)
+
+def Truncate(text, tokens):
+    if CountTokens(text) <= tokens:
+        return text
+    if encoding is not None:
+        return encoding.decode(encoding.encode(text)[:tokens])
+    return text[:tokens * 4]
+
+
+def RecentHistory():
+    # Turns the rolling summary does not cover yet
+    pending = store.count() - min(summarizer.covered, store.count())
+    return store.recent(min(pending, MaxHistory))
+
+def Recall(query, history, budget):
+    # Relevant older turns and search results from the vector memory,
+    # skipping turns that are already in the prompt
+    if budget <= 0:
+        return None
+    shown = {
+        f"User: {q['content']}\nAssistant: {a['content']}"
+        for q, a in zip(history, history[1:])
+        if q["role"] == "user" and a["role"] == "assistant"
+    }
+    lines = []
+    used = 0
+    for _, kind, text in memory.search(query, k=MemoryResults, exclude=shown):
+        line = f"- ({kind}) {text}"
+        cost = CountTokens(line)
+        if used + cost > budget:
+            line = Truncate(line, budget - used)
+            cost = budget - used
+        lines.append(line)
+        used += cost
+        if used >= budget:
+            break
+    if not lines:
+        return None
+    return {"role": "system", "content": "Possibly relevant from earlier conversations:\n" + "\n".join(lines)}
+
+def BuildContext(model, max_tokens, system, query, time_info=None, search=None, history=None):
+    # Fills the budget in priority order: system, time info, search results,
+    # rolling summary, recalled memories, then recent turns from newest to
+    # oldest
+    if history is None:
+        history = RecentHistory()
+    budget = ModelBudget(model, max_tokens)
+    head = [{"role": "system", "content": system}]
+    if time_info:
+        head.append({"role": "system", "content": time_info})
+    tail = [{"role": "user", "content": query}]
+    used = sum(MessageTokens(m) for m in head + tail)
+
+    if search:
+        remaining = budget - used - 4
+        if remaining > 0:
+            search = Truncate(search, remaining)
+            head.append({"role": "system", "content": search})
+            used += MessageTokens(head[-1])
+
+    summary = summarizer.summary
+    if summary:
+        message = {"role": "system", "content": f"Summary of the earlier conversation: {summary}"}
+        if used + MessageTokens(message) <= budget:
+            head.append(message)
+            used += MessageTokens(message)
+
+    recalled = Recall(query, history, min(MemoryBudget, budget - used - 8))
+    if recalled is not None:
+        head.append(recalled)
+        used += MessageTokens(recalled)
+
+    turns = []
+    for message in reversed(history):
+        cost = MessageTokens(message)
+        if used + cost > budget:
+            break
+        turns.append(message)
+        used += cost
+    # Never start the history on a dangling assistant reply
+    if turns and turns[-1]["role"] == "assistant":
+        turns.pop()
+    return head + turns[::-1] + tail
+
+
+# Keeps a rolling summary of turns that have left the recent window. It runs
+# on its own worker thread after a turn is saved, never on the answer path.
+class Summarizer:
+    def __init__(self, path=SummaryPath):
+        self.path = path
+        self.summary = ""
+        self.covered = 0
+        self.client = Groq()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="Summarizer")
+        self.scheduled = False
+        self.lock = threading.Lock()
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            self.summary = data.get("summary", "")
+            self.covered = data.get("covered", 0)
+        except (OSError, ValueError):
+            pass
+
+    def schedule(self):
+        with self.lock:
+            if self.covered > store.count():
+                # The history was reset underneath the summary
+                self.summary, self.covered = "", 0
+            if self.scheduled or store.count() - self.covered < RecentTurns + SummaryBatch:
+                return
+            self.scheduled = True
+        self.executor.submit(self._run)
+
+    def _run(self):
+        try:
+            # At most SummaryBatch turns per run, each cut to its share of the
+            # token budget, so a backlog left by failed runs never outgrows
+            # the model's context; later runs catch up batch by batch
+            end = store.count() - RecentTurns
+            start = min(self.covered, end)
+            end = min(end, start + SummaryBatch)
+            if end <= start:
+                return
+            turns = store.slice(start, end)
+            if not turns:
+                # Nothing readable for this range yet; leave covered where it
+                # is so the next run retries it
+                return
+            share = SummaryInputTokens // len(turns)
+            transcript = "\n".join(f"{t['role']}: {Truncate(t['content'], share)}" for t in turns)
+            prompt = (
+                "Update the running summary of a conversation between a user and an assistant. "
+                "Keep names, facts, preferences and open questions; stay under 150 words.\n\n"
+                f"Current summary:\n{self.summary or '(none)'}\n\nNew turns:\n{transcript}"
+            )
+            completion = Call("groq", lambda: self.client.chat_completion(
+                model=SummaryModel,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=300,
+                temperature=0.3,
+            ), hedge=False, kind="summary")
+            self.summary = completion["choices"][0]["message"]["content"].strip()
+            self.covered = end
+            self.save()
+        except Exception as e:
+            print(f"Error summarizing conversation: {e}")
+            return
+        finally:
+            with self.lock:
+                self.scheduled = False
+        self.schedule()
+
+    def save(self):
+        try:
+            with open(self.path, "w", encoding="utf-8") as file:
+                json.dump({"summary": self.summary, "covered": self.covered}, file)
+        except OSError as e:
+            print(f"Error saving conversation summary: {e}")
+
+
+summarizer = Summarizer()
@@ -0,0 +1,203 @@
+from collections import deque
+from dotenv import dotenv_values
+import threading
+import sqlite3
+import queue
+import json
+import time
+import os
+
+env_vars = dotenv_values(".env")
+Username = env_vars.get("Username")
+Assistantname = env_vars.get("Assistantname")
+
+DatabasePath = os.path.join("Data", "Conversation.db")
+LegacyChatLogPath = os.path.join("Data", "ChatLog.json")
+TranscriptPath = os.path.join(os.getcwd(), "Frontend", "Files", "Database.data")
+
+Schema = """
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    source TEXT NOT NULL DEFAULT 'chat'
+);
+CREATE INDEX IF NOT EXISTS turns_ts ON turns (ts);
+CREATE INDEX IF NOT EXISTS turns_source ON turns (source, id);
+"""
+
+
+def TranscriptLine(role, content):
+    name = Username if role == "user" else Assistantname
+    return f"{name} : {content}\n"
+
+
+# Single conversation store shared by ChatBot and RealtimeSearchEngine.
+# Turns are appended to an SQLite database in WAL mode by a background
+# writer that batches inserts, the most recent turns are cached in memory,
+# and the GUI transcript is extended line by line instead of regenerated.
+class ConversationStore:
+    def __init__(self, path=DatabasePath, transcript_path=TranscriptPath, cache_size=200, batch_delay=0.05):
+        self.path = path
+        self.transcript_path = transcript_path
+        self.batch_delay = batch_delay
+        self.cache = deque(maxlen=cache_size)
+        self.pending = queue.Queue()
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        db = self.connect()
+        try:
+            with db:
+                db.executescript(Schema)
+                self.total = db.execute("SELECT COUNT(*) FROM turns").fetchone()[0]
+                if self.total == 0:
+                    self.total = self.migrate(db)
+            rows = db.execute(
+                "SELECT role, content FROM turns ORDER BY id DESC LIMIT ?", (cache_size,)
+            ).fetchall()
+        finally:
+            db.close()
+        for role, content in reversed(rows):
+            self.cache.append({"role": role, "content": content})
+
+        self.writer = threading.Thread(target=self._write_loop, daemon=True, name="ConversationStore")
+        self.writer.start()
+
+    def connect(self):
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def migrate(self, db):
+        # One-time import of the old Data/ChatLog.json history
+        try:
+            with open(LegacyChatLogPath, "r", encoding="utf-8") as file:
+                history = json.load(file)
+        except (OSError, ValueError):
+            return 0
+        if not isinstance(history, list):
+            return 0
+        now = time.time()
+        rows = [
+            (now, entry["role"], entry["content"], "chat")
+            for entry in history
+            if isinstance(entry, dict) and "role" in entry and "content" in entry
+        ]
+        db.executemany("INSERT INTO turns (ts, role, content, source) VALUES (?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def append(self, role, content, source="chat"):
+        self._append([(role, content)], source)
+
+    def append_turn(self, query, answer, source="chat"):
+        # Both halves go in under one lock as one queued item, so parallel
+        # answers cannot interleave into user/user/assistant/assistant
+        self._append([("user", query), ("assistant", answer)], source)
+
+    def _append(self, messages, source):
+        now = time.time()
+        with self.lock:
+            for role, content in messages:
+                self.cache.append({"role": role, "content": content})
+            self.total += len(messages)
+            self.pending.put([(now, role, content, source) for role, content in messages])
+
+    def recent(self, count):
+        with self.lock:
+            if count <= 0:
+                return []
+            return list(self.cache)[-count:]
+
+    def slice(self, start, end):
+        # Turns by absolute position: the cached tail from memory, anything
+        # older from the database
+        with self.lock:
+            first = self.total - len(self.cache)
+            turns = list(self.cache)
+        older = []
+        if start < min(end, first):
+            self.flush()
+            db = self.connect()
+            try:
+                rows = db.execute(
+                    "SELECT role, content FROM turns ORDER BY id LIMIT ? OFFSET ?", (min(end, first) - start, start)
+                ).fetchall()
+            finally:
+                db.close()
+            older = [{"role": role, "content": content} for role, content in rows]
+        return older + turns[max(start - first, 0):max(end - first, 0)]
+
+    def count(self):
+        return self.total
+
+    def clear_context(self):
+        # Forget the in-memory context; the archive on disk is kept
+        with self.lock:
+            self.cache.clear()
+
+    def flush(self):
+        self.pending.join()
+
+    def _write_loop(self):
+        db = self.connect()
+        while True:
+            batch = [self.pending.get()]
+            # Gather whatever else arrives shortly after into the same transaction
+            deadline = time.monotonic() + self.batch_delay
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            rows = [row for group in batch for row in group]
+            try:
+                with db:
+                    db.executemany("INSERT INTO turns (ts, role, content, source) VALUES (?, ?, ?, ?)", rows)
+                self.append_transcript(rows)
+            except (sqlite3.Error, OSError) as e:
+                print(f"Error saving chat history: {e}")
+            finally:
+                for _ in batch:
+                    self.pending.task_done()
+
+    def append_transcript(self, batch):
+        with open(self.transcript_path, "a", encoding="utf-8") as file:
+            file.write("".join(TranscriptLine(role, content) for _, role, content, _ in batch))
+
+    def rebuild_transcript(self):
+        # Only needed when the transcript file is missing or was cleared
+        self.flush()
+        db = self.connect()
+        try:
+            rows = db.execute("SELECT role, content FROM turns ORDER BY id").fetchall()
+        finally:
+            db.close()
+        with open(self.transcript_path, "w", encoding="utf-8") as file:
+            file.write("".join(TranscriptLine(role, content) for role, content in rows))
+
+    def archive(self, after_id=0):
+        # Every turn on disk after the given row id, oldest first
+        self.flush()
+        db = self.connect()
+        try:
+            return db.execute(
+                "SELECT id, role, content FROM turns WHERE id > ? ORDER BY id", (after_id,)
+            ).fetchall()
+        finally:
+            db.close()
+
+    def transcript(self):
+        try:
+            with open(self.transcript_path, "r", encoding="utf-8") as file:
+                return file.read()
+        except OSError:
+            return ""
+
+
+store = ConversationStore()
@@ -0,0 +1,93 @@
+from Backend.Streaming import EventLoop
+import threading
+import asyncio
+import time
+
+
+# One node of a decision graph. run is either a coroutine function or a
+# blocking callable (blocking=True), which is moved to a worker thread.
+class Task:
+    def __init__(self, name, run, blocking=True, after=()):
+        self.name = name
+        self.run = run
+        self.blocking = blocking
+        self.after = list(after)
+        self.result = None
+        self.error = None
+        self.seconds = 0.0
+
+    def __repr__(self):
+        return f"Task({self.name!r})"
+
+
+async def _execute(task, done):
+    # Waits for its dependencies, then runs; failures are kept on the task
+    for dependency in task.after:
+        await done[dependency]
+    started = time.monotonic()
+    try:
+        if task.blocking:
+            task.result = await asyncio.get_running_loop().run_in_executor(None, task.run)
+        else:
+            task.result = await task.run()
+    except Exception as e:
+        task.error = e
+        print(f"Task {task.name} failed: {e}")
+    task.seconds = time.monotonic() - started
+
+async def RunGraph(tasks):
+    done = {}
+    for task in tasks:
+        done[task] = asyncio.ensure_future(_execute(task, done))
+    await asyncio.gather(*done.values())
+    return tasks
+
+def Dispatch(tasks):
+    # Blocking entry point: the whole graph runs on the shared event loop,
+    # so a compound command takes as long as its slowest branch
+    return asyncio.run_coroutine_threadsafe(RunGraph(tasks), EventLoop()).result()
+
+
+# Hands tokens from concurrently generated answers to one sink in slot
+# order. The earliest unfinished slot streams live; later slots are buffered
+# and flushed as soon as everything before them has finished.
+class OrderedStream:
+    def __init__(self, sink, on_finish=None, separator=None):
+        self.sink = sink
+        self.on_finish = on_finish
+        self.separator = separator
+        self.buffers = []
+        self.results = []
+        self.finished = []
+        self.head = 0
+        self.lock = threading.Lock()
+
+    def slot(self):
+        with self.lock:
+            index = len(self.buffers)
+            self.buffers.append([])
+            self.results.append(None)
+            self.finished.append(False)
+        return index
+
+    def feed(self, index, token):
+        with self.lock:
+            if index == self.head:
+                self.sink(token)
+            else:
+                self.buffers[index].append(token)
+
+    def finish(self, index, result):
+        with self.lock:
+            self.results[index] = result
+            self.finished[index] = True
+            while self.head < len(self.finished) and self.finished[self.head]:
+                if self.on_finish:
+                    self.on_finish(self.head, self.results[self.head])
+                if self.separator:
+                    self.separator()
+                self.head += 1
+                if self.head < len(self.buffers):
+                    for token in self.buffers[self.head]:
+                        self.sink(token)
+                    self.buffers[self.head].clear()
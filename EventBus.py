@@ -0,0 +1,70 @@
+from dotenv import dotenv_values
+import threading
+import queue
+import os
+
+env_vars = dotenv_values(".env")
+
+# The old .data files are only written when external tools still need them
+MirrorDataFiles = env_vars.get("MirrorDataFiles", "False").lower() == "true"
+TempoDirPath = os.path.join(os.getcwd(), "Frontend", "Files")
+MirrorFiles = {"mic": "Mic.data", "status": "Status.data", "response": "Responses.data"}
+
+
+# In-process event bus between the pipeline thread and the GUI. The latest
+# value of every topic is kept in memory; subscribers are called on every
+# publish, and mic toggles are also queued so the pipeline thread can block
+# on them instead of polling.
+class EventBus:
+    def __init__(self):
+        self.state = {"mic": "False", "status": "", "response": ""}
+        self.subscribers = {}
+        self.mic_events = queue.Queue()
+        self.lock = threading.Lock()
+
+    def publish(self, topic, value):
+        with self.lock:
+            self.state[topic] = value
+            callbacks = list(self.subscribers.get(topic, []))
+        if topic == "mic":
+            self.mic_events.put(value)
+        if MirrorDataFiles and topic in MirrorFiles:
+            self.mirror(topic, value)
+        for callback in callbacks:
+            try:
+                callback(value)
+            except Exception as e:
+                print(f"Error in {topic} subscriber: {e}")
+
+    def subscribe(self, topic, callback):
+        with self.lock:
+            self.subscribers.setdefault(topic, []).append(callback)
+        return callback
+
+    def unsubscribe(self, topic, callback):
+        with self.lock:
+            if callback in self.subscribers.get(topic, []):
+                self.subscribers[topic].remove(callback)
+
+    def get(self, topic, default=""):
+        with self.lock:
+            return self.state.get(topic, default)
+
+    def wait_for_mic(self, status="True", timeout=None):
+        # Blocks until the microphone is toggled to `status`
+        while self.get("mic") != status:
+            try:
+                self.mic_events.get(timeout=timeout)
+            except queue.Empty:
+                return False
+        return True
+
+    def mirror(self, topic, value):
+        try:
+            with open(os.path.join(TempoDirPath, MirrorFiles[topic]), "w", encoding="utf-8") as file:
+                file.write(value)
+        except OSError as e:
+            print(f"Error mirroring {topic}: {e}")
+
+
+bus = EventBus()
@@ -4,8 +4,9 @@ from PyQt5.QtWidgets import (
     QVBoxLayout, QPushButton, QLabel, QSizePolicy, QFrame, QHBoxLayout
 )
 from PyQt5.QtGui import QIcon, QMovie, QColor, QTextCharFormat, QFont, QPixmap, QTextBlockFormat, QPainter
-from PyQt5.QtCore import Qt, QSize, QTimer
+from PyQt5.QtCore import Qt, QSize, QObject, QTimer, pyqtSignal
 from dotenv import dotenv_values
+from Backend.EventBus import bus
 import sys
 import os
 
@@ -19,6 +20,26 @@ TempoDirPath = os.path.join(current_dir, "Frontend", "Files")
 GraphicsDirPath = os.path.join(current_dir, "Frontend", "Graphics")
 old_chat_message = ""
 
+# Qt side of the event bus: bus callbacks run on the pipeline thread and emit
+# these signals, which Qt delivers to the widgets on the GUI thread
+class GuiSignals(QObject):
+    status = pyqtSignal(str)
+    response = pyqtSignal(str)
+    image = pyqtSignal(str)
+    partial = pyqtSignal(str)
+
+signals = None
+
+def ConnectEventBus():
+    global signals
+    if signals is None:
+        signals = GuiSignals()
+        bus.subscribe("status", signals.status.emit)
+        bus.subscribe("response", signals.response.emit)
+        bus.subscribe("image", signals.image.emit)
+        bus.subscribe("partial", signals.partial.emit)
+    return signals
+
 # Utility functions
 def AnswerModifier(answer):
     return '\n'.join([line for line in answer.split('\n') if line.strip()])
@@ -40,16 +61,19 @@ def readFromFile(path):
         return file.read()
 
 def SetMicrophoneStatus(status):
-    writeToFile(os.path.join(TempoDirPath, "Mic.data"), status)
+    bus.publish("mic", status)
 
 def GetMicrophoneStatus():
-    return readFromFile(os.path.join(TempoDirPath, "Mic.data"))
+    return bus.get("mic")
+
+def WaitForMicrophone():
+    bus.wait_for_mic("True")
 
 def SetAssistantStatus(status):
-    writeToFile(os.path.join(TempoDirPath, "Status.data"), status)
+    bus.publish("status", status)
 
 def GetAssistantStatus():
-    return readFromFile(os.path.join(TempoDirPath, "Status.data"))
+    return bus.get("status")
 
 def GraphicsDirectoryPath(filename):
     return os.path.join(GraphicsDirPath, filename)
@@ -58,7 +82,14 @@ def TempDirectoryPath(filename):
     return os.path.join(TempoDirPath, filename)
 
 def ShowTextToScreen(text):
-    writeToFile(os.path.join(TempoDirPath, "Responses.data"), text)
+    bus.publish("response", text)
+
+def ShowImageOnScreen(path):
+    bus.publish("image", path)
+
+def ShowPartialTranscript(text):
+    # Interim speech results; shown in place of the status line while listening
+    bus.publish("partial", text)
 
 # Chat Section class
 class ChatSection(QWidget):
@@ -87,24 +118,22 @@ class ChatSection(QWidget):
         font.setPointSize(13)
         self.chat_text_edit.setFont(font)
 
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.loadMessages)
-        self.timer.timeout.connect(self.updateStatusLabel)
-        self.timer.start(500)
+        signals = ConnectEventBus()
+        signals.response.connect(self.loadMessages)
+        signals.status.connect(self.updateStatusLabel)
+        signals.image.connect(self.addImage)
+        signals.partial.connect(self.updateStatusLabel)
+        self.loadMessages(bus.get("response"))
+        self.updateStatusLabel(GetAssistantStatus())
 
-    def loadMessages(self):
+    def loadMessages(self, messages):
         global old_chat_message
-        path = TempDirectoryPath("Response.data")
-        if not os.path.exists(path):
-            return
-
-        messages = readFromFile(path)
         if messages and messages != old_chat_message:
             self.addMessage(messages, 'white')
             old_chat_message = messages
 
-    def updateStatusLabel(self):
-        self.label.setText(GetAssistantStatus())
+    def updateStatusLabel(self, status):
+        self.label.setText(status)
 
     def addMessage(self, message, color):
         cursor = self.chat_text_edit.textCursor()
@@ -118,6 +147,13 @@ class ChatSection(QWidget):
         cursor.insertText(message + "\n")
         self.chat_text_edit.setTextCursor(cursor)
 
+    def addImage(self, path):
+        cursor = self.chat_text_edit.textCursor()
+        cursor.movePosition(cursor.End)
+        cursor.insertImage(path)
+        cursor.insertText("\n")
+        self.chat_text_edit.setTextCursor(cursor)
+
 # Initial Screen
 class InitialScreen(QWidget):
     def __init__(self):
@@ -146,12 +182,13 @@ class InitialScreen(QWidget):
         self.toggle_icon()
         self.icon_label.mousePressEvent = self.toggle_icon_event
 
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.updateStatusLabel)
-        self.timer.start(500)
+        signals = ConnectEventBus()
+        signals.status.connect(self.updateStatusLabel)
+        signals.partial.connect(self.updateStatusLabel)
+        self.updateStatusLabel(GetAssistantStatus())
 
-    def updateStatusLabel(self):
-        self.label.setText(GetAssistantStatus())
+    def updateStatusLabel(self, status):
+        self.label.setText(status)
 
     def load_icon(self, path):
         pixmap = QPixmap(path)
@@ -203,10 +240,13 @@ class MainWindow(QMainWindow):
         self.stacked_widget.setCurrentIndex(1)
 
 # Entry point
-def GraphicalUserInterface():
+def GraphicalUserInterface(on_shown=None):
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
+    if on_shown:
+        # Runs once the event loop has painted the window
+        QTimer.singleShot(0, on_shown)
     sys.exit(app.exec_())
 
 if __name__ == "__main__":
@@ -0,0 +1,232 @@
+from Backend.Resilience import Backoff
+from email.utils import parsedate_to_datetime
+import datetime
+import asyncio
+import base64
+import time
+import httpx
+
+MaxWait = 120.0
+MaxAttempts = 6
+
+
+def RetryAfter(response):
+    # Retry-After is either seconds or an HTTP date
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+        return max(0.0, (when - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def EstimatedTime(response):
+    # 503 "model is loading" responses say how long the cold start will take
+    try:
+        return float(response.json().get("estimated_time"))
+    except (ValueError, TypeError, AttributeError):
+        return None
+
+def DecodeImage(response):
+    if response.headers.get("content-type", "").startswith("image/"):
+        return response.content
+    output = response.json()
+    # Some models return base64-encoded images
+    if isinstance(output, list) and output and "generated_image" in output[0]:
+        return base64.b64decode(output[0]["generated_image"])
+    if isinstance(output, dict) and "error" in output:
+        print("API returned an error:", output["error"])
+    else:
+        print("Unexpected response format:", output)
+    return None
+
+
+# Client-side scheduler for the Hugging Face inference endpoint. Requests
+# pass a token bucket (rate) and an adaptive concurrency limit; throttling
+# (429) and cold starts (503 with estimated_time) halve both, and every
+# success grows them back additively. One pooled client is reused per loop.
+class HFScheduler:
+    def __init__(self, url, headers, rate=2.0, burst=4, max_concurrency=4, timeout=120.0):
+        self.url = url
+        self.headers = headers
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.refilled = time.monotonic()
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.lowest_limit = max_concurrency
+        self.active = 0
+        self.timeout = timeout
+        self.client = None
+        self.loop = None
+        self.condition = None
+        self.successes = 0
+        self.throttled = 0
+        self.cold_starts = 0
+        self.failures = 0
+
+    def _bind(self):
+        # The pooled client and condition belong to the running loop
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            self.condition = asyncio.Condition()
+            self.client = httpx.AsyncClient(timeout=self.timeout, limits=httpx.Limits(max_connections=self.max_concurrency))
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.refilled) * self.rate)
+        self.refilled = now
+
+    async def _acquire(self):
+        async with self.condition:
+            while True:
+                self._refill()
+                if self.active < self.limit and self.tokens >= 1:
+                    self.tokens -= 1
+                    self.active += 1
+                    return
+                wait = (1 - self.tokens) / self.rate if self.tokens < 1 else None
+                try:
+                    await asyncio.wait_for(self.condition.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _release(self, throttled=False):
+        # throttled covers any sign of an overloaded endpoint: 429, 503,
+        # other 5xx and connection failures all back off; only successes grow
+        async with self.condition:
+            self.active -= 1
+            if throttled:
+                self.limit = max(1, self.limit // 2)
+                self.rate = max(self.max_rate / 8, self.rate / 2)
+                self.lowest_limit = min(self.lowest_limit, self.limit)
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1)
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 4)
+            self.condition.notify_all()
+
+    async def post(self, payload):
+        # Image bytes, or None once the attempts or the wait budget run out
+        self._bind()
+        waited = 0.0
+        for attempt in range(MaxAttempts):
+            await self._acquire()
+            throttled = False
+            try:
+                response = await self.client.post(self.url, headers=self.headers, json=payload)
+            except httpx.HTTPError as e:
+                throttled = True
+                delay = Backoff(attempt, base=0.5, cap=8.0)
+                print(f"API request failed: {e}")
+            else:
+                if response.status_code == 200:
+                    self.successes += 1
+                    await self._release()
+                    return DecodeImage(response)
+                if response.status_code == 503:
+                    throttled = True
+                    self.cold_starts += 1
+                    delay = EstimatedTime(response) or RetryAfter(response) or Backoff(attempt, base=1.0, cap=16.0)
+                    print(f"Model is loading, retrying in {delay:.1f}s")
+                elif response.status_code == 429:
+                    throttled = True
+                    self.throttled += 1
+                    delay = RetryAfter(response) or Backoff(attempt, base=1.0, cap=16.0)
+                    print(f"Rate limited, retrying in {delay:.1f}s")
+                elif response.status_code >= 500:
+                    throttled = True
+                    delay = Backoff(attempt, base=0.5, cap=8.0)
+                    print(f"API error: {response.status_code}, retrying")
+                else:
+                    print(f"API error: {response.status_code} - {response.text}")
+                    self.failures += 1
+                    await self._release()
+                    return None
+            await self._release(throttled)
+            if waited + delay > MaxWait:
+                break
+            waited += delay
+            await asyncio.sleep(delay)
+        self.failures += 1
+        return None
+
+    def stats(self):
+        return {
+            "successes": self.successes,
+            "throttled": self.throttled,
+            "cold_starts": self.cold_starts,
+            "failures": self.failures,
+            "rate": self.rate,
+            "limit": self.limit,
+            "lowest_limit": self.lowest_limit,
+        }
+
+
+if __name__ == "__main__":
+    # Runs the scheduler against a local stub that cold-starts for a second,
+    # then throttles every third request and anything above two in flight,
+    # and checks that the scheduler backed off
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+    import threading
+    import json
+
+    started = time.monotonic()
+    in_flight = [0]
+    served = [0]
+    lock = threading.Lock()
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def reply(self, status, body, content_type="application/json", headers=()):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            remaining = 1.0 - (time.monotonic() - started)
+            if remaining > 0:
+                body = json.dumps({"error": "Model is currently loading", "estimated_time": remaining}).encode()
+                return self.reply(503, body)
+            with lock:
+                served[0] += 1
+                busy = in_flight[0] >= 2 or served[0] % 3 == 0
+                if not busy:
+                    in_flight[0] += 1
+            if busy:
+                return self.reply(429, b'{"error": "Rate limit reached"}', headers=[("Retry-After", "0.5")])
+            try:
+                time.sleep(0.3)
+                self.reply(200, b"\xff\xd8fake-jpeg\xff\xd9", content_type="image/jpeg")
+            finally:
+                with lock:
+                    in_flight[0] -= 1
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    scheduler = HFScheduler(f"http://127.0.0.1:{server.server_address[1]}", {}, rate=4.0, max_concurrency=4)
+
+    async def main():
+        results = await asyncio.gather(*(scheduler.post({"inputs": f"test {i}"}) for i in range(8)))
+        print(f"{sum(r is not None for r in results)}/8 images in {time.monotonic() - started:.1f}s")
+        stats = scheduler.stats()
+        print(stats)
+        assert stats["cold_starts"] > 0 and stats["throttled"] > 0, "stub did not exercise backoff"
+        assert stats["lowest_limit"] < scheduler.max_concurrency, "concurrency limit never shrank"
+
+    asyncio.run(main())
+    server.shutdown()
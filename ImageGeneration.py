@@ -1,114 +1,152 @@
 import asyncio
-import base64
-from random import randint
+import json
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 from PIL import Image
-import requests
 import os
-from time import sleep
 from dotenv import load_dotenv
+from Backend.ImageStore import ImageStore
+from Backend.HFScheduler import HFScheduler
 
 # Load the API key from .env
 load_dotenv()
 API_KEY = os.getenv("HuggingFaceAPIKey")
 
-if not API_KEY:
-    raise ValueError("HuggingFaceAPIKey not found in .env")
-
 # Constants
-API_URL = "https://api-inference.huggingface.co/models/stabilityai/stable-diffusion-xl-base-1.0"
+MODEL = "stabilityai/stable-diffusion-xl-base-1.0"
+API_URL = os.getenv("HuggingFaceURL", f"https://api-inference.huggingface.co/models/{MODEL}")
+QUALITY = "4K quality, ultra-detailed, high-resolution"
 headers = {"Authorization": f"Bearer {API_KEY}"}
 DATA_DIR = "Data"
-IMAGE_DATA_FILE = os.path.join("Frontend", "Files", "ImageGeneration.data")
-
-os.makedirs(DATA_DIR, exist_ok=True)
-
-def open_images(prompt):
-    prompt = prompt.replace(" ", "_")
-    files = [f"{prompt}{i}.jpg" for i in range(1, 5)]
-
-    for jpg_file in files:
-        image_path = os.path.join(DATA_DIR, jpg_file)
-        try:
-            img = Image.open(image_path)
-            print(f"Opening image: {image_path}")
-            img.show()
-            sleep(1)
-        except IOError:
-            print(f"Unable to open {image_path}")
+THUMBNAIL_DIR = os.path.join(DATA_DIR, "Thumbnails")
+THUMBNAIL_SIZE = (256, 256)
+IMAGE_COUNT = int(os.getenv("ImageCount", 4))
+IMAGE_STORE_BYTES = int(os.getenv("ImageStoreBytes", 512 * 1024 * 1024))
+
+os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+thumbnail_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="Thumbnail")
+image_store = ImageStore(os.path.join(DATA_DIR, "ImageStore"), IMAGE_STORE_BYTES)
+# Downloads in progress by store key; identical requests await the same task
+inflight = {}
+scheduler = HFScheduler(
+    API_URL, headers,
+    rate=float(os.getenv("HuggingFaceRate", 2.0)),
+    max_concurrency=int(os.getenv("HuggingFaceConcurrency", 4)),
+)
+
+def make_thumbnail(path, key):
+    # Runs in the thumbnail pool; the GUI shows the small copy
+    thumbnail_path = os.path.join(THUMBNAIL_DIR, f"{key}.jpg")
+    if not os.path.exists(thumbnail_path):
+        with Image.open(path) as img:
+            img.thumbnail(THUMBNAIL_SIZE)
+            img.convert("RGB").save(thumbnail_path, "JPEG", quality=85)
+    # Attached to the stored image so it is evicted along with it
+    image_store.attach(key, thumbnail_path)
+    return os.path.abspath(thumbnail_path)
 
 async def query(payload):
-    try:
-        response = await asyncio.to_thread(requests.post, API_URL, headers=headers, json=payload)
-        if response.status_code != 200:
-            print(f"API error: {response.status_code} - {response.text}")
-            return None
-
-        output = response.json()
-
-        # Some models return base64-encoded images
-        if isinstance(output, list) and "generated_image" in output[0]:
-            image_base64 = output[0]["generated_image"]
-            return base64.b64decode(image_base64)
-        elif "error" in output:
-            print("API returned an error:", output["error"])
-        else:
-            print("Unexpected response format:", output)
-        return None
-
-    except Exception as e:
-        print(f"API request failed: {str(e)}")
+    if not API_KEY:
+        raise ValueError("HuggingFaceAPIKey not found in .env")
+    # Rate limits, cold starts and retries are handled by the scheduler
+    return await scheduler.post(payload)
+
+def image_seed(prompt, i):
+    # Stable per prompt and position, so asking again hits the store
+    digest = hashlib.sha1(f"{prompt}\0{i}".encode("utf-8")).hexdigest()
+    return int(digest, 16) % 1000000
+
+async def download(key, prompt, seed):
+    image_bytes = await query({"inputs": f"{prompt}, {QUALITY}, seed={seed}"})
+    if not image_bytes:
         return None
+    return await asyncio.to_thread(image_store.put, key, image_bytes)
+
+async def fetch_image(i, prompt):
+    seed = image_seed(prompt, i)
+    key = ImageStore.key(MODEL, prompt, seed, QUALITY)
+    path = image_store.get(key)
+    if path is None:
+        task = inflight.get(key)
+        if task is None:
+            task = inflight[key] = asyncio.ensure_future(download(key, prompt, seed))
+            task.add_done_callback(lambda _: inflight.pop(key, None))
+        path = await asyncio.shield(task)
+    return i, key, path
+
+async def generate_images(prompt: str, count=IMAGE_COUNT, on_image=None):
+    # Images are linked and thumbnailed as each one becomes available, so the
+    # first is ready at single-request latency (or at once from the store)
+    tasks = [asyncio.ensure_future(fetch_image(i, prompt)) for i in range(1, count + 1)]
+
+    loop = asyncio.get_running_loop()
+    paths = []
+    for next_done in asyncio.as_completed(tasks):
+        i, key, stored_path = await next_done
+        if not stored_path:
+            print(f"Image {i} failed to generate.")
+            continue
+        file_path = image_store.link(key, os.path.join(DATA_DIR, f"{prompt.replace(' ', '_')}{i}.jpg"))
+        print(f"Image saved to: {file_path}")
+        paths.append(file_path)
+        try:
+            thumbnail_path = await loop.run_in_executor(thumbnail_pool, make_thumbnail, stored_path, key)
+        except OSError as e:
+            print(f"Unable to thumbnail {file_path}: {e}")
+            thumbnail_path = file_path
+        if on_image:
+            on_image(i, file_path, thumbnail_path)
+    return paths
 
-async def generate_images(prompt: str):
-    tasks = []
-    for _ in range(4):
-        payload = {
-            "inputs": f"{prompt}, 4K quality, ultra-detailed, high-resolution, seed={randint(0, 1000000)}"
-        }
-        tasks.append(asyncio.create_task(query(payload)))
-
-    image_bytes_list = await asyncio.gather(*tasks)
-
-    for i, image_bytes in enumerate(image_bytes_list):
-        if image_bytes:
-            file_path = os.path.join(DATA_DIR, f"{prompt.replace(' ', '_')}{i + 1}.jpg")
-            with open(file_path, "wb") as f:
-                f.write(image_bytes)
-            print(f"Image saved to: {file_path}")
-        else:
-            print(f"Image {i+1} failed to generate.")
-
-def GenerateImages(prompt: str):
-    asyncio.run(generate_images(prompt))
-    open_images(prompt)
-
-# Main loop
-while True:
-    try:
-        with open(IMAGE_DATA_FILE, "r") as f:
-            data = f.read().strip()
+def GenerateImages(prompt: str, count=IMAGE_COUNT):
+    return asyncio.run(generate_images(prompt, count))
 
-        if not data:
-            sleep(1)
-            continue
 
-        Prompt, Status = data.split(",")
+# Long-lived worker: Backend.ImageWorker starts this module once with -m and
+# sends jobs as JSON lines on stdin. Jobs run concurrently on one event loop
+# and progress/results go back as JSON lines on stdout.
+events_lock = threading.Lock()
 
-        if Status.strip().lower() == "true":
-            print("Generating Images...")
-            GenerateImages(prompt=Prompt.strip())
+def report(stream, job_id, event, **fields):
+    with events_lock:
+        stream.write(json.dumps({"id": job_id, "event": event, **fields}) + "\n")
+        stream.flush()
 
-            # Reset the data file
-            with open(IMAGE_DATA_FILE, "w") as f:
-                f.write("False,False")
+async def run_job(stream, job):
+    job_id, prompt = job["id"], job["prompt"]
+    report(stream, job_id, "started")
 
-            break
-        else:
-            sleep(1)
+    def on_image(index, path, thumbnail):
+        report(stream, job_id, "image", index=index, path=path, thumbnail=thumbnail)
 
-    except KeyboardInterrupt:
-        print("Interrupted by user.")
-        break
+    try:
+        paths = await generate_images(prompt, job.get("count") or IMAGE_COUNT, on_image)
+        report(stream, job_id, "done", paths=paths)
     except Exception as e:
-        print(f"Error: {e}")
-        sleep(1)
+        report(stream, job_id, "error", message=str(e))
+
+def Worker():
+    # stdout carries events only; everything printed goes to stderr
+    events = sys.stdout
+    sys.stdout = sys.stderr
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    for line in sys.stdin:
+        try:
+            job = json.loads(line)
+        except ValueError:
+            continue
+        asyncio.run_coroutine_threadsafe(run_job(events, job), loop)
+    # stdin closed: the parent is gone or shutting us down; finish running jobs
+    pending = asyncio.run_coroutine_threadsafe(drain(), loop)
+    pending.result()
+
+async def drain():
+    tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+if __name__ == "__main__":
+    Worker()
@@ -0,0 +1,130 @@
+from collections import OrderedDict
+import threading
+import hashlib
+import json
+import os
+
+
+# Content-addressed store of generated images, keyed by everything that
+# determines the output. Blobs live in one size-bounded LRU directory; the
+# familiar Data/{prompt}{i}.jpg files are hard links (copies where links are
+# not supported) recorded as views and removed with the blob they point to.
+# Files derived from a blob, such as thumbnails, are attached the same way.
+class ImageStore:
+    def __init__(self, directory, max_disk_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.views_path = os.path.join(directory, "views.json")
+        self.disk = OrderedDict()
+        self.disk_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        # Rebuild the LRU order from modification times left by earlier runs
+        entries = []
+        for name in os.listdir(directory):
+            if name.endswith(".jpg"):
+                stat = os.stat(os.path.join(directory, name))
+                entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self.disk[key] = size
+            self.disk_bytes += size
+        try:
+            with open(self.views_path, "r", encoding="utf-8") as file:
+                self.views = json.load(file)
+        except (OSError, ValueError):
+            self.views = {}
+
+    @staticmethod
+    def key(model, prompt, seed, params):
+        return hashlib.sha256("\0".join((model, prompt, str(seed), params)).encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.jpg")
+
+    def get(self, key):
+        # Path of the stored image, or None
+        with self.lock:
+            if key not in self.disk or not os.path.exists(self.path(key)):
+                self.misses += 1
+                return None
+            os.utime(self.path(key))
+            self.disk.move_to_end(key)
+            self.hits += 1
+            return self.path(key)
+
+    def put(self, key, image):
+        with self.lock:
+            try:
+                with open(self.path(key), "wb") as file:
+                    file.write(image)
+            except OSError as e:
+                print(f"Error writing image store: {e}")
+                return None
+            self.disk_bytes += len(image) - self.disk.pop(key, 0)
+            self.disk[key] = len(image)
+            while self.disk_bytes > self.max_disk_bytes and len(self.disk) > 1:
+                old_key, size = self.disk.popitem(last=False)
+                self.disk_bytes -= size
+                self._remove(old_key)
+            self._save_views()
+            return self.path(key)
+
+    def _remove(self, key):
+        stale = [view for view, target in self.views.items() if target == key]
+        for path in [self.path(key)] + stale:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        for view in stale:
+            del self.views[view]
+
+    def link(self, key, view):
+        # Points a readable file name at a stored image
+        with self.lock:
+            if self.views.get(view) == key and os.path.exists(view):
+                return view
+            try:
+                if os.path.exists(view):
+                    os.remove(view)
+                try:
+                    os.link(self.path(key), view)
+                except OSError:
+                    with open(self.path(key), "rb") as source, open(view, "wb") as target:
+                        target.write(source.read())
+            except OSError as e:
+                print(f"Error linking {view}: {e}")
+                return self.path(key)
+            self.views[view] = key
+            self._save_views()
+            return view
+
+    def attach(self, key, path):
+        # Records a file derived from a stored image so eviction removes it too
+        with self.lock:
+            if key not in self.disk:
+                return False
+            if self.views.get(path) != key:
+                self.views[path] = key
+                self._save_views()
+            return True
+
+    def _save_views(self):
+        try:
+            with open(self.views_path, "w", encoding="utf-8") as file:
+                json.dump(self.views, file)
+        except OSError as e:
+            print(f"Error saving image views: {e}")
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "images": len(self.disk),
+            "disk_bytes": self.disk_bytes,
+        }
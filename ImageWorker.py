@@ -0,0 +1,109 @@
+from concurrent.futures import Future
+import subprocess
+import threading
+import itertools
+import atexit
+import json
+import sys
+
+
+# A submitted prompt. future resolves to the list of saved image paths;
+# on_progress is called with every event the worker reports for the job.
+class ImageJob:
+    def __init__(self, job_id, prompt, on_progress=None):
+        self.id = job_id
+        self.prompt = prompt
+        self.on_progress = on_progress
+        self.process = None
+        self.future = Future()
+
+    def result(self, timeout=None):
+        return self.future.result(timeout)
+
+
+# Parent side of the image worker: one Backend.ImageGeneration process kept
+# alive for the whole session, fed through a pipe instead of a polled file.
+# The process is started on first use (or by start()), restarted if it
+# dies, and reaped at exit.
+class ImageWorker:
+    def __init__(self, command=(sys.executable, "-m", "Backend.ImageGeneration")):
+        self.command = list(command)
+        self.process = None
+        self.jobs = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        atexit.register(self.stop)
+
+    def start(self):
+        with self.lock:
+            self._ensure()
+
+    def _ensure(self):
+        if self.process is not None and self.process.poll() is None:
+            return
+        self.process = subprocess.Popen(
+            self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            text=True, encoding="utf-8", bufsize=1,
+        )
+        threading.Thread(target=self._read, args=(self.process,), daemon=True, name="ImageWorker").start()
+
+    def submit(self, prompt, on_progress=None, count=None):
+        with self.lock:
+            self._ensure()
+            job = ImageJob(next(self.ids), prompt, on_progress)
+            job.process = self.process
+            self.jobs[job.id] = job
+            try:
+                self.process.stdin.write(json.dumps({"id": job.id, "prompt": prompt, "count": count}) + "\n")
+                self.process.stdin.flush()
+            except OSError as e:
+                self.jobs.pop(job.id)
+                job.future.set_exception(e)
+        return job
+
+    def _read(self, process):
+        for line in process.stdout:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            with self.lock:
+                job = self.jobs.get(event.get("id"))
+                if job is not None and event["event"] in ("done", "error"):
+                    del self.jobs[job.id]
+            if job is None:
+                continue
+            if job.on_progress:
+                try:
+                    job.on_progress(event)
+                except Exception as e:
+                    print(f"Error in image progress callback: {e}")
+            if event["event"] == "done":
+                job.future.set_result(event.get("paths", []))
+            elif event["event"] == "error":
+                job.future.set_exception(RuntimeError(event.get("message", "image generation failed")))
+
+        # The worker exited: whatever it still owed us has failed
+        process.wait()
+        with self.lock:
+            orphaned = [job for job in self.jobs.values() if job.process is process]
+            for job in orphaned:
+                del self.jobs[job.id]
+        for job in orphaned:
+            if not job.future.done():
+                job.future.set_exception(RuntimeError("image worker exited"))
+
+    def stop(self, timeout=5):
+        with self.lock:
+            process, self.process = self.process, None
+        if process is None or process.poll() is not None:
+            return
+        try:
+            process.stdin.close()
+            process.wait(timeout)
+        except (OSError, subprocess.TimeoutExpired):
+            process.kill()
+            process.wait()
+
+
+image_worker = ImageWorker()
@@ -0,0 +1,263 @@
+from Backend.SppeechToText import SpeechBackend, SetAssistantStatus
+from Backend.VoiceActivity import Endpointer, StripWakeWord, VoiceGate, WakeWord
+from Backend.Startup import startup
+from dotenv import dotenv_values
+import numpy as np
+import threading
+import queue
+import wave
+import json
+import time
+import os
+
+env_vars = dotenv_values(".env")
+# Unpacked model directory from https://alphacephei.com/vosk/models
+VoskModelPath = env_vars.get("VoskModel", os.path.join("Data", "Models", "vosk-model-small-en-us-0.15"))
+SampleRate = 16000
+ChunkMs = 100
+# How long to wait for the query after a wake word said on its own
+CommandWaitMs = 5000
+
+
+# Audio sources yield 16-bit mono PCM chunks as bytes
+
+def WavFrames(path, chunk_ms=ChunkMs):
+    # Reads a PCM WAV file; stereo is mixed down to the first channel
+    with wave.open(path, "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit PCM WAV files are supported")
+        channels = wav.getnchannels()
+        frames = max(1, wav.getframerate() * chunk_ms // 1000)
+        while True:
+            data = wav.readframes(frames)
+            if not data:
+                return
+            if channels > 1:
+                data = np.frombuffer(data, dtype=np.int16)[::channels].tobytes()
+            yield data
+
+def WavInfo(path):
+    with wave.open(path, "rb") as wav:
+        return wav.getframerate(), wav.getnframes() / wav.getframerate()
+
+class MicFrames:
+    # Microphone capture through sounddevice; iterate to get chunks, close() to stop
+    def __init__(self, sample_rate=SampleRate, chunk_ms=ChunkMs):
+        try:
+            import sounddevice
+        except ImportError as e:
+            raise RuntimeError("Microphone input needs the sounddevice package") from e
+        self.sample_rate = sample_rate
+        self.chunks = queue.Queue()
+        self.stream = sounddevice.RawInputStream(
+            samplerate=sample_rate, blocksize=sample_rate * chunk_ms // 1000,
+            dtype="int16", channels=1, callback=self._callback,
+        )
+        self.stream.start()
+
+    def _callback(self, data, frames, time_info, status):
+        self.chunks.put(bytes(data))
+
+    def __iter__(self):
+        while self.stream.active:
+            yield self.chunks.get()
+
+    def close(self):
+        self.stream.stop()
+        self.stream.close()
+
+
+# Offline recognition with Vosk (Kaldi) on the CPU. The model is loaded
+# once; each utterance gets a fresh recognizer fed chunk by chunk, so
+# partial hypotheses stream out while audio is still arriving.
+class VoskBackend(SpeechBackend):
+    name = "vosk"
+
+    def __init__(self, model_path=VoskModelPath, sample_rate=SampleRate):
+        self.model_path = model_path
+        self.sample_rate = sample_rate
+        self.model = None
+        self.lock = threading.Lock()
+
+    def prepare(self):
+        with self.lock:
+            if self.model is None:
+                try:
+                    import vosk
+                except ImportError as e:
+                    raise RuntimeError("The vosk speech backend needs the vosk package") from e
+                if not os.path.isdir(self.model_path):
+                    raise RuntimeError(f"Vosk model not found at {self.model_path}")
+                vosk.SetLogLevel(-1)
+                model = vosk.Model(self.model_path)
+                if VoiceGate and WakeWord:
+                    # Words outside the vocabulary are dropped from a grammar,
+                    # so such a wake word could never be heard
+                    missing = [word for word in WakeWord.split() if model.find_word(word) < 0]
+                    if missing:
+                        raise RuntimeError(
+                            f"Wake word {WakeWord!r} has words the Vosk model doesn't know: {', '.join(missing)}"
+                        )
+                self.model = model
+        return self.model
+
+    def recognizer(self, sample_rate):
+        import vosk
+        return vosk.KaldiRecognizer(self.prepare(), sample_rate)
+
+    def transcribe(self, chunks, sample_rate=None, on_interim=None, stop_at_endpoint=False):
+        # Feeds chunks through one recognizer. Returns the text of the first
+        # endpointed utterance when stop_at_endpoint, otherwise all of it.
+        recognizer = self.recognizer(sample_rate or self.sample_rate)
+        parts = []
+        last_partial = ""
+        for chunk in chunks:
+            if recognizer.AcceptWaveform(chunk):
+                text = json.loads(recognizer.Result()).get("text", "")
+                if text:
+                    parts.append(text)
+                    if stop_at_endpoint:
+                        return text
+                last_partial = ""
+            elif on_interim:
+                partial = json.loads(recognizer.PartialResult()).get("partial", "")
+                if partial and partial != last_partial:
+                    last_partial = partial
+                    on_interim(" ".join(parts + [partial]))
+        text = json.loads(recognizer.FinalResult()).get("text", "")
+        if text:
+            parts.append(text)
+        return " ".join(parts)
+
+    def transcribe_wav(self, path, on_interim=None):
+        sample_rate, _ = WavInfo(path)
+        return self.transcribe(WavFrames(path), sample_rate, on_interim)
+
+    def heard_wake_word(self, chunks, sample_rate=None):
+        # Decoding against a grammar of just the wake word's words is much
+        # cheaper than open vocabulary, so every utterance can be checked
+        import vosk
+        grammar = json.dumps(WakeWord.split() + ["[unk]"])
+        recognizer = vosk.KaldiRecognizer(self.prepare(), sample_rate or self.sample_rate, grammar)
+        texts = []
+        for chunk in chunks:
+            if recognizer.AcceptWaveform(chunk):
+                texts.append(json.loads(recognizer.Result()).get("text", ""))
+        texts.append(json.loads(recognizer.FinalResult()).get("text", ""))
+        return StripWakeWord(" ".join(texts), WakeWord) is not None
+
+    def listen(self, on_interim=None):
+        mic = MicFrames(self.sample_rate)
+        startup.mark("first listen")
+        try:
+            if not VoiceGate:
+                return self.transcribe(mic, self.sample_rate, on_interim, stop_at_endpoint=True)
+            return self.listen_gated(Endpointer(mic, ChunkMs, sample_rate=self.sample_rate), on_interim)
+        finally:
+            mic.close()
+
+    def listen_gated(self, endpointer, on_interim=None):
+        # The recognizer only runs on endpointed utterances; silence and
+        # noise never reach it, and utterances it can't make words of are
+        # dropped here instead of becoming queries
+        for utterance in endpointer.utterances():
+            if not WakeWord:
+                text = self.transcribe(utterance, self.sample_rate, on_interim)
+                if text:
+                    return text
+                continue
+
+            chunks = list(utterance)
+            if not self.heard_wake_word(chunks):
+                continue
+            text = StripWakeWord(self.transcribe(chunks, self.sample_rate), WakeWord)
+            if text:
+                return text
+            # Wake word on its own: the query is the next utterance
+            SetAssistantStatus("Listening...")
+            head = endpointer.wait(limit_ms=CommandWaitMs)
+            if head is not None:
+                text = self.transcribe(endpointer.utterance(head), self.sample_rate, on_interim)
+                if text:
+                    return text
+        return ""
+
+
+def WordErrorRate(reference, hypothesis):
+    ref, hyp = reference.lower().split(), hypothesis.lower().split()
+    if not ref:
+        return float(bool(hyp))
+    row = list(range(len(hyp) + 1))
+    for i, word in enumerate(ref, 1):
+        previous, row[0] = row[0], i
+        for j, guess in enumerate(hyp, 1):
+            previous, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, previous + (word != guess))
+    return row[-1] / len(ref)
+
+def Benchmark(directory, engine=None):
+    # Runs every WAV in the directory through the engine as fast as it can
+    # take the audio. RTF is processing time over audio duration; latency is
+    # the time from the last chunk to the final hypothesis. A .txt file with
+    # the same name, if present, is used as the reference for WER.
+    engine = engine or VoskBackend()
+    with startup.timed("model load"):
+        engine.prepare()
+    rows = []
+    for name in sorted(os.listdir(directory)):
+        if not name.lower().endswith(".wav"):
+            continue
+        path = os.path.join(directory, name)
+        sample_rate, duration = WavInfo(path)
+        chunks = list(WavFrames(path))
+        marks = {}
+
+        def timed_chunks():
+            for chunk in chunks:
+                yield chunk
+            marks["fed"] = time.perf_counter()
+
+        def first_partial(text):
+            marks.setdefault("partial", time.perf_counter())
+
+        started = time.perf_counter()
+        text = engine.transcribe(timed_chunks(), sample_rate, first_partial)
+        finished = time.perf_counter()
+        row = {
+            "file": name,
+            "audio_s": duration,
+            "rtf": (finished - started) / duration if duration else 0.0,
+            "latency_ms": (finished - marks["fed"]) * 1000,
+            "first_partial_ms": (marks["partial"] - started) * 1000 if "partial" in marks else None,
+            "text": text,
+        }
+        reference = os.path.splitext(path)[0] + ".txt"
+        if os.path.exists(reference):
+            with open(reference, "r", encoding="utf-8") as file:
+                row["wer"] = WordErrorRate(file.read(), text)
+        rows.append(row)
+        wer = f", wer {row['wer']:.2%}" if "wer" in row else ""
+        print(f"{name}: rtf {row['rtf']:.3f}, latency {row['latency_ms']:.0f} ms{wer}, {text!r}")
+
+    if rows:
+        audio = sum(row["audio_s"] for row in rows)
+        rtf = sum(row["rtf"] * row["audio_s"] for row in rows) / audio if audio else 0.0
+        latencies = sorted(row["latency_ms"] for row in rows)
+        print(f"{len(rows)} files, {audio:.1f}s audio, overall RTF {rtf:.3f}, "
+              f"median latency {latencies[len(latencies) // 2]:.0f} ms")
+        scored = [row["wer"] for row in rows if "wer" in row]
+        if scored:
+            print(f"mean WER {sum(scored) / len(scored):.2%} over {len(scored)} files")
+    startup.report()
+    return rows
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 2 and sys.argv[1] == "--bench":
+        Benchmark(sys.argv[2])
+    elif len(sys.argv) > 1:
+        print(VoskBackend().transcribe_wav(sys.argv[1], on_interim=lambda text: print("...", text)))
+    else:
+        print("Listening... (Press Ctrl+C to stop)")
+        print("Detected:", VoskBackend().listen(on_interim=lambda text: print("...", text)))
@@ -1,28 +1,41 @@
+from Backend.Startup import startup
 from Frontend.GUI import (
     GraphicalUserInterface,
     SetAssistantStatus,
     ShowTextToScreen,
+    ShowImageOnScreen,
+    ShowPartialTranscript,
     TempDirectoryPath,
     SetMicrophoneStatus,
     AnswerModifier,
     QueryModifier,
     GetMicrophoneStatus,
     GetAssistantStatus,
+    WaitForMicrophone,
 )
 from Backend.Model import FirstLayerDMM
 from Backend.RealtimeSearchEngine import RealtimeSearchEngine
 from Backend.Automation import Automation
 from Backend.SppeechToText import SpeechRecognition
 from Backend.Chatbot import ChatBot
-from Backend.TextToSpeech import TextToSpeech
+from Backend.TextToSpeech import SpeechPipeline
+from Backend.Providers import WarmUp, RewarmIfIdle
+from Backend.Model import Cohere
+from Backend.SppeechToText import GetBackend
+from Backend.AudioEngine import engine
+from Backend.Streaming import WarmStream
+from Backend.ConversationStore import store
+from Backend.Memory import memory
+from Backend.Speculation import Speculation, stats as speculation_stats
+from Backend.ImageWorker import image_worker
+from Backend.Dispatcher import Task, Dispatch, OrderedStream
+from Backend.AnswerCache import DependsOnContext
 from dotenv import dotenv_values
-from asyncio import run
-from time import sleep
-import subprocess
 import threading
-import json
 import os
 
+startup.mark("imports")
+
 env_vars = dotenv_values(".env")
 Username = env_vars.get("Username")
 Assistantname = env_vars.get("Assistantname")
@@ -32,127 +45,167 @@ DefaultMessage = (
     f"{Assistantname} : Welcome {Username}. I am doing well. How may I help you?"
 )
 
-subprocess_list = []
 Functions = ["open", "close", "play", "system", "content", "google search", "youtube search"]
 
 def ShowDefaultChatIfNoChats():
-    with open('Data/ChatLog.json', "r", encoding='utf-8') as file:
-        if len(file.read()) < 5:
-            with open(TempDirectoryPath('Database.data'), 'w', encoding='utf-8') as db_file:
-                db_file.write("")
-            with open(TempDirectoryPath('Responses.data'), 'w', encoding='utf-8') as res_file:
-                res_file.write(DefaultMessage)
-
-def ReadChatLogJson():
-    with open('Data/ChatLog.json', 'r', encoding='utf-8') as file:
-        return json.load(file)
+    if store.count() == 0:
+        with open(TempDirectoryPath('Database.data'), 'w', encoding='utf-8') as db_file:
+            db_file.write("")
+        ShowTextToScreen(DefaultMessage)
 
 def ChatLogIntegration():
-    json_data = ReadChatLogJson()
-    formatted_chatlog = ""
-    for entry in json_data:
-        if entry["role"] == "user":
-            formatted_chatlog += f"{Username} : {entry['content']}\n"
-        elif entry["role"] == "assistant":
-            formatted_chatlog += f"{Assistantname} : {entry['content']}\n"
-    with open(TempDirectoryPath('Database.data'), 'w', encoding='utf-8') as file:
-        file.write(formatted_chatlog)
+    # The store extends Database.data turn by turn; rebuild only if it went missing
+    if store.count() > 0 and not store.transcript():
+        store.rebuild_transcript()
 
 def ShowChatsOnGUI():
-    with open(TempDirectoryPath('Database.data'), "r", encoding='utf-8') as file:
-        data = file.read()
+    data = store.transcript()
     if len(data) > 0:
         result = '\n'.join(data.splitlines())
-        with open(TempDirectoryPath('Responses.data'), "w", encoding='utf-8') as file:
-            file.write(result)
+        ShowTextToScreen(result)
 
 def InitialExecution():
+    # Only what the first frame needs; everything slow is in WarmUpSubsystems
     SetMicrophoneStatus("False")
     ShowTextToScreen("")
     ShowDefaultChatIfNoChats()
     ChatLogIntegration()
     ShowChatsOnGUI()
 
-InitialExecution()
+def WarmUpSubsystems():
+    # Background warm-up after the window is shown. Each subsystem also
+    # starts itself on first use, so the order only decides what is ready first.
+    steps = [
+        ("connections", WarmUp),
+        ("llm stream", lambda: WarmStream(force=True)),
+        ("speech recognition", lambda: GetBackend().prepare()),
+        ("cohere client", Cohere),
+        ("audio engine", engine.start),
+        ("memory index", memory.start),
+        ("image worker", image_worker.start),
+    ]
+    for name, step in steps:
+        with startup.timed(name):
+            try:
+                step()
+            except Exception as e:
+                print(f"Warm-up of {name} failed: {e}")
+    startup.mark("warm-up done")
+    startup.report()
+
+def OnWindowShown():
+    startup.mark("window shown")
+    threading.Thread(target=WarmUpSubsystems, daemon=True, name="WarmUp").start()
+
+def AnswerAloud(Generate, Query, **kwargs):
+    # Speech starts with the first complete sentence while the rest streams in
+    speech = SpeechPipeline(on_start=lambda: SetAssistantStatus("Answering..."))
+    Answer = Generate(QueryModifier(Query), on_token=speech.feed, **kwargs)
+    ShowTextToScreen(f"{Assistantname} : {Answer}")
+    speech.close(fallback=Answer)
+    speech.wait()
+    return Answer
+
+def ImageProgress(event):
+    # Each image is shown as soon as the worker has saved and thumbnailed it
+    if event["event"] == "image":
+        ShowImageOnScreen(event["thumbnail"])
+    elif event["event"] == "done":
+        print(f"Images ready: {', '.join(event['paths']) or 'none'}")
+    elif event["event"] == "error":
+        print(f"Image generation failed: {event['message']}")
+
+def GenerateImage(ImageGenerationQuery):
+    # Queued on the long-lived image worker; results arrive in the background
+    Prompt = ImageGenerationQuery.removeprefix("generate image ").removeprefix("generate ")
+    return image_worker.submit(Prompt.strip(), on_progress=ImageProgress)
+
+def AnswerTask(stream, Generate, Query, **kwargs):
+    # One answer branch: tokens go through the ordered stream so answers
+    # generated side by side are still spoken one after another
+    index = stream.slot()
+
+    def run():
+        fed = []
+        def on_token(token):
+            fed.append(token)
+            stream.feed(index, token)
+
+        Answer = None
+        try:
+            Answer = Generate(QueryModifier(Query), on_token=on_token, **kwargs)
+            if not fed and Answer:
+                stream.feed(index, Answer)
+            return Answer
+        finally:
+            stream.finish(index, Answer)
+    return run
+
+def BuildGraph(Decision, Draft, stream):
+    # Independent intents become parallel tasks; an answer that refers back
+    # to the conversation waits for the answer before it
+    tasks = []
+    automation = [d for d in Decision if any(d.startswith(func) for func in Functions)]
+    if automation:
+        tasks.append(Task("automation", lambda: Automation(automation), blocking=False))
+
+    for d in Decision:
+        if d.startswith("generate image"):
+            tasks.append(Task(d, lambda d=d: GenerateImage(d)))
+
+    previous = None
+    for d in Decision:
+        if d.startswith("general "):
+            Query = d.removeprefix("general ")
+            kwargs = {}
+            if Draft is not None and Draft.matches(Query):
+                kwargs["draft"], Draft = Draft, None
+            run = AnswerTask(stream, ChatBot, Query, **kwargs)
+        elif d.startswith("realtime "):
+            run = AnswerTask(stream, RealtimeSearchEngine, d.removeprefix("realtime "))
+        else:
+            continue
+        after = [previous] if previous is not None and DependsOnContext(d) else []
+        previous = Task(d, run, after=after)
+        tasks.append(previous)
+    return tasks
 
 def MainExecution():
-    TaskExecution = False
-    ImageExecution = False
-    ImageGenerationQuery = ""
-
     SetAssistantStatus("Listening...")
-    Query = SpeechRecognition()
+    RewarmIfIdle()
+    WarmStream()
+    Query = SpeechRecognition(on_interim=ShowPartialTranscript)
+    if not Query:
+        return None
     ShowTextToScreen(f"{Username} : {Query}")
+    # Prefetch search results / draft an answer while the query is classified
+    speculation = Speculation(Query)
     SetAssistantStatus("Thinking...")
     Decision = FirstLayerDMM(Query)
+    Draft = speculation.resolve(Decision)
 
     print("\nDecision :", Decision, "\n")
 
-    G = any(i.startswith("general") for i in Decision)
-    R = any(i.startswith("realtime") for i in Decision)
+    def ShowAnswer(index, Answer):
+        # The chat appends each published message, so only the new answer goes out
+        if Answer:
+            ShowTextToScreen(f"{Assistantname} : {Answer}")
 
-    Merged_query = " and ".join(
-        " ".join(i.split()[1:]) for i in Decision if i.startswith("general") or i.startswith("realtime")
-    )
+    speech = SpeechPipeline(on_start=lambda: SetAssistantStatus("Answering..."))
+    stream = OrderedStream(speech.feed, on_finish=ShowAnswer, separator=speech.flush)
+    tasks = BuildGraph(Decision, Draft, stream)
 
-    for queries in Decision:
-        if "generate" in queries:
-            ImageGenerationQuery = queries
-            ImageExecution = True
-
-    for queries in Decision:
-        if not TaskExecution and any(queries.startswith(func) for func in Functions):
-            run(Automation(Decision))
-            TaskExecution = True
-
-    if ImageExecution:
-        with open(r"Frontend/Files/ImageGeneration.data", "w") as file:
-            file.write(f"{ImageGenerationQuery},True")
-        try:
-            p1 = subprocess.Popen(
-                ['python', r'Backend/ImageGeneration.py'],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                stdin=subprocess.PIPE,
-                shell=False
-            )
-            subprocess_list.append(p1)
-        except Exception as e:
-            print(f"Error starting ImageGeneration.py: {e}")
-
-    if G and R or R:
+    if any(d.startswith("realtime") for d in Decision):
         SetAssistantStatus("Searching...")
-        Answer = RealtimeSearchEngine(QueryModifier(Merged_query))
-        ShowTextToScreen(f"{Assistantname} : {Answer}")
-        SetAssistantStatus("Answering...")
-        TextToSpeech(Answer)
-        return True
-    else:
-        for Queries in Decision:
-            if "general" in Queries:
-                SetAssistantStatus("Thinking...")
-                QueryFinal = Queries.replace("general ", "")
-                Answer = ChatBot(QueryModifier(QueryFinal))
-                ShowTextToScreen(f"{Assistantname} : {Answer}")
-                SetAssistantStatus("Answering...")
-                TextToSpeech(Answer)
-                return True
-
-            elif "realtime" in Queries:
-                SetAssistantStatus("Searching...")
-                QueryFinal = Queries.replace("realtime ", "")
-                Answer = RealtimeSearchEngine(QueryModifier(QueryFinal))
-                ShowTextToScreen(f"{Assistantname} : {Answer}")
-                SetAssistantStatus("Answering...")
-                TextToSpeech(Answer)
-                return True
-
-            elif "exit" in Queries:
-                Answer = ChatBot(QueryModifier("okay, Bye!"))
-                ShowTextToScreen(f"{Assistantname} : {Answer}")
-                SetAssistantStatus("Answering...")
-                TextToSpeech(Answer)
-                os._exit(0)
+    Dispatch(tasks)
+    speech.close()
+    speech.wait()
+    print("Speculation:", speculation_stats.report())
+
+    if any(d.strip() == "exit" for d in Decision):
+        AnswerAloud(ChatBot, "okay, Bye!")
+        os._exit(0)
+    return bool(tasks) or None
 
 def FirstThread():
     while True:
@@ -163,12 +216,14 @@ def FirstThread():
             AIStatus = GetAssistantStatus()
             if "Available..." not in AIStatus:
                 SetAssistantStatus("Available...")
-            sleep(0.1)
+            WaitForMicrophone()
 
 def SecondThread():
-    GraphicalUserInterface()
+    GraphicalUserInterface(on_shown=OnWindowShown)
 
 if __name__ == "__main__":
+    with startup.timed("initial state"):
+        InitialExecution()
     thread2 = threading.Thread(target=FirstThread, daemon=True)
     thread2.start()
     SecondThread()
@@ -0,0 +1,146 @@
+from Backend.ConversationStore import store
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import dotenv_values
+import numpy as np
+import threading
+import hashlib
+import sqlite3
+import zlib
+import time
+import re
+import os
+
+env_vars = dotenv_values(".env")
+MemoryEnabled = env_vars.get("Memory", "True").lower() == "true"
+
+MemoryDirectory = os.path.join("Data", "Memory")
+Dimensions = 512
+InitialCapacity = 1024
+MinSimilarity = 0.25
+Word = re.compile(r"\w+")
+BigramWeight = 3.0
+
+
+def Embed(text, dim=Dimensions, bigrams=False):
+    # Hashed features: words plus character trigrams of each word, signed by
+    # a second hash bit so collisions tend to cancel. No model to load.
+    # Word bigrams, weighted up, make the vector sensitive to word order.
+    vector = np.zeros(dim, dtype=np.float32)
+    words = Word.findall(text.lower())
+    for word in words:
+        features = [word]
+        padded = f" {word} "
+        features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        for feature in features:
+            h = zlib.crc32(feature.encode("utf-8"))
+            vector[h % dim] += 1.0 if h & 0x80000000 else -1.0
+    if bigrams:
+        for first, second in zip(["^"] + words, words + ["$"]):
+            h = zlib.crc32(f"{first} {second}".encode("utf-8"))
+            vector[h % dim] += BigramWeight if h & 0x80000000 else -BigramWeight
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+# Semantic index over past turns and search results. Vectors live in a
+# memory-mapped float32 matrix that grows by doubling; the text for each
+# row is kept in SQLite. Search is a brute-force dot product, which stays
+# in the low milliseconds for tens of thousands of entries.
+class VectorMemory:
+    def __init__(self, directory=MemoryDirectory, dim=Dimensions):
+        self.dim = dim
+        self.vector_path = os.path.join(directory, "vectors.f32")
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="Memory")
+
+        os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(directory, "memory.db"), check_same_thread=False)
+        with self.db:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS items (row INTEGER PRIMARY KEY, kind TEXT, text TEXT, digest TEXT UNIQUE, ts REAL)"
+            )
+            self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+        self.size = self.db.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+        self.capacity = 0
+        self.vectors = None
+        self._open(max(InitialCapacity, self.size))
+
+    def _open(self, capacity):
+        if self.vectors is not None:
+            self.vectors.flush()
+            del self.vectors
+        with open(self.vector_path, "ab") as file:
+            if file.tell() < capacity * self.dim * 4:
+                file.truncate(capacity * self.dim * 4)
+        self.vectors = np.memmap(self.vector_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self.capacity = capacity
+
+    def add(self, text, kind="turn"):
+        text = text.strip()
+        if not text:
+            return
+        digest = hashlib.sha1(f"{kind}\0{text}".encode("utf-8")).hexdigest()
+        vector = Embed(text, self.dim)
+        with self.lock:
+            if self.db.execute("SELECT 1 FROM items WHERE digest = ?", (digest,)).fetchone():
+                return
+            if self.size >= self.capacity:
+                self._open(self.capacity * 2)
+            self.vectors[self.size] = vector
+            with self.db:
+                self.db.execute(
+                    "INSERT INTO items VALUES (?, ?, ?, ?, ?)", (self.size, kind, text, digest, time.time())
+                )
+            self.size += 1
+
+    def remember(self, text, kind="turn"):
+        # Indexing happens on the memory worker, off the answer path
+        if MemoryEnabled:
+            self.executor.submit(self.add, text, kind)
+
+    def remember_turn(self, query, answer):
+        self.remember(f"User: {query}\nAssistant: {answer}")
+
+    def search(self, query, k=4, min_similarity=MinSimilarity, exclude=()):
+        if not MemoryEnabled:
+            return []
+        vector = Embed(query, self.dim)
+        with self.lock:
+            if self.size == 0:
+                return []
+            scores = self.vectors[:self.size] @ vector
+            top = min(len(scores), k + len(exclude))
+            rows = np.argpartition(-scores, top - 1)[:top]
+            rows = rows[np.argsort(-scores[rows])]
+            found = []
+            for row in rows:
+                if scores[row] < min_similarity or len(found) >= k:
+                    break
+                kind, text = self.db.execute("SELECT kind, text FROM items WHERE row = ?", (int(row),)).fetchone()
+                if text not in exclude:
+                    found.append((float(scores[row]), kind, text))
+        return found
+
+    def backfill(self):
+        # Indexes archived turns that predate the index, a pair at a time
+        with self.lock:
+            row = self.db.execute("SELECT value FROM meta WHERE key = 'turn_id'").fetchone()
+        last_id = row[0] if row else 0
+        pending = None
+        for turn_id, role, content in store.archive(last_id):
+            if role == "user":
+                pending = content
+            elif pending is not None:
+                self.add(f"User: {pending}\nAssistant: {content}")
+                pending = None
+            last_id = turn_id
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('turn_id', ?)", (last_id,))
+
+    def start(self):
+        if MemoryEnabled:
+            self.executor.submit(self.backfill)
+
+
+memory = VectorMemory()
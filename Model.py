@@ -1,13 +1,28 @@
 
-import cohere
 from rich import print
+from Backend.Providers import CohereClient
+from Backend.Resilience import Call
+from Backend.CommandGrammar import ParseCommand, Normalize, stats as fast_path_stats
+from collections import OrderedDict
 from dotenv import dotenv_values
+import threading
+import json
+import time
+import sys
+import os
 
 env_vars = dotenv_values(".env")
 
 CohereAPIkey = env_vars.get("CohereAPIkey")
 
-co = cohere.Client(api_key=CohereAPIkey)
+co = None
+
+def Cohere():
+    # Created on first use so importing Model stays cheap
+    global co
+    if co is None:
+        co = CohereClient(api_key=CohereAPIkey)
+    return co
 if not CohereAPIkey:
     raise Exception("Cohere API Key not found. Please check your .env file.")
 
@@ -54,12 +69,88 @@ ChatHistory = [
 
 ]   
 
-def FirstLayerDMM(prompt: str = "test"):
-    messages.clear()
-    messages.append({"role": "user", "content": f"{prompt}"})
-
-
-    stream = co.chat_stream(
+# Queries that lean on earlier turns ("who is he?") must be reclassified every time
+ContextWords = {
+    "he", "him", "his", "she", "her", "hers", "they", "them", "their", "it", "its",
+    "this", "that", "these", "those", "there", "more", "again", "same",
+}
+
+# Remembers FirstLayerDMM decisions for repeated queries, with LRU + TTL
+# eviction, persisted to Data/DecisionCache.json across restarts
+class DecisionCache:
+    def __init__(self, path=os.path.join("Data", "DecisionCache.json"), max_entries=500, ttl=7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.load()
+
+    def key(self, prompt):
+        text = Normalize(prompt)
+        words = set(text.replace("'", " ").split())
+        if not text or words & ContextWords:
+            return None
+        return text
+
+    def get(self, prompt):
+        key = self.key(prompt)
+        if key is None:
+            return None
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or time.time() - entry["time"] > self.ttl:
+                self.entries.pop(key, None)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return list(entry["decision"])
+
+    def put(self, prompt, decision):
+        key = self.key(prompt)
+        if key is None:
+            return
+        with self.lock:
+            self.entries[key] = {"decision": list(decision), "time": time.time()}
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        self.save()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+        self.save()
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        for key, entry in data.items():
+            if now - entry.get("time", 0) <= self.ttl:
+                self.entries[key] = entry
+
+    def save(self):
+        with self.lock:
+            data = json.dumps(self.entries)
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path + ".tmp", "w", encoding="utf-8") as file:
+                file.write(data)
+            os.replace(self.path + ".tmp", self.path)
+        except OSError as e:
+            print(f"Error saving decision cache: {e}")
+
+decision_cache = DecisionCache()
+
+def ClassifyWithLLM(prompt):
+    stream = Cohere().chat_stream(
         model='command-r-plus',
         message=prompt,
         temperature=0.7,
@@ -76,31 +167,78 @@ def FirstLayerDMM(prompt: str = "test"):
         if event.event_type == "text-generation":
            response += event.text
 
+    return response
 
-    response = response.replace("\n", "")
-    response = response.split(",")
+# The model sometimes echoes the "(query)" placeholder; reclassify a bounded number of times
+MaxReclassify = 3
 
-    response = [i.strip() for i in response]
-
-    temp = []
+def FirstLayerDMM(prompt: str = "test"):
+    # Plain commands ("open chrome and firefox", "volume up") skip the LLM
+    fast = ParseCommand(prompt)
+    if fast:
+        fast_path_stats.hit()
+        return fast
 
-    for task in response:
-        for func in funcs:
-            if task.lower().startswith(func.lower()):
-                temp.append(task)
-         
-        if not temp:
-            temp.append(f"general {prompt.strip()}")
+    cached = decision_cache.get(prompt)
+    if cached:
+        return cached
 
-    response = temp 
+    messages.clear()
+    messages.append({"role": "user", "content": f"{prompt}"})
 
-    if any("(query)" in r for r in response):
-        newresponse = FirstLayerDMM(prompt=prompt)
-        return newresponse
-    else:
-        return response
+    for _ in range(MaxReclassify):
+        started = time.perf_counter()
+        response = Call("cohere", lambda: ClassifyWithLLM(prompt))
+
+        response = response.replace("\n", "")
+        response = response.split(",")
+
+        response = [i.strip() for i in response]
+
+        temp = []
+
+        for task in response:
+            for func in funcs:
+                if task.lower().startswith(func.lower()):
+                    temp.append(task)
+             
+            if not temp:
+                temp.append(f"general {prompt.strip()}")
+
+        response = temp 
+
+        fast_path_stats.miss(time.perf_counter() - started)
+
+        if not any("(query)" in r for r in response):
+            decision_cache.put(prompt, response)
+            return response
+
+    return [f"general {prompt.strip()}"]
+
+def BenchmarkDecisionCache(queries):
+    # Cold: every query goes to the LLM. Warm: the same queries again from the cache.
+    # Run as python -m Backend.Model --bench; the cold pass needs a live Cohere key.
+    for query in queries:
+        decision_cache.entries.pop(decision_cache.key(query), None)
+    for label in ("cold", "warm"):
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            FirstLayerDMM(query)
+            timings.append(time.perf_counter() - started)
+        average = sum(timings) / len(timings) * 1000
+        print(f"{label}: {average:.1f} ms average over {len(queries)} queries")
+    print(f"cache hits: {decision_cache.hits}, misses: {decision_cache.misses}")
     
 if __name__== "__main__":
 
+    if "--bench" in sys.argv:
+        BenchmarkDecisionCache([
+            "what's the time?", "who was akbar?", "how can i study more effectively?",
+            "what is python programming language?", "tell me today's news",
+        ])
+        sys.exit(0)
+
     while True:
         print(FirstLayerDMM(input(">>> ")))
+        print(fast_path_stats.report())
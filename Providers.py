@@ -0,0 +1,109 @@
+from dotenv import dotenv_values
+import threading
+import time
+import httpx
+
+# Load environment variables
+env_vars = dotenv_values(".env")
+GroqAPIKey = env_vars.get("GroqAPIKey")
+CohereAPIkey = env_vars.get("CohereAPIkey")
+
+GroqBaseURL = "https://api.groq.com/openai/v1"
+CohereBaseURL = "https://api.cohere.com"
+
+# HTTP/2 needs the optional "h2" package (pip install httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2 = env_vars.get("UseHTTP2", "True").lower() == "true"
+except ImportError:
+    HTTP2 = False
+
+# Connections idle for longer than this are re-warmed before the next query
+IdleRewarmSeconds = float(env_vars.get("IdleRewarmSeconds", 45))
+
+Timeout = httpx.Timeout(connect=5.0, read=30.0, write=10.0, pool=5.0)
+Limits = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=300)
+
+
+# One keep-alive connection pool per provider host
+class PooledConnection:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.http = httpx.Client(
+            http2=HTTP2, timeout=Timeout, limits=Limits,
+            event_hooks={"request": [self.touch], "response": [self.touch]},
+        )
+        self.last_used = 0.0
+        self.lock = threading.Lock()
+
+    def touch(self, _=None):
+        self.last_used = time.monotonic()
+
+    def warm(self):
+        # Any request to the host leaves a TLS connection behind in the pool
+        with self.lock:
+            try:
+                self.http.head(self.base_url, timeout=5.0)
+            except httpx.HTTPError as e:
+                print(f"Warm-up failed for {self.base_url}: {e}")
+
+    def warm_if_idle(self):
+        if time.monotonic() - self.last_used > IdleRewarmSeconds:
+            threading.Thread(target=self.warm, daemon=True).start()
+
+
+groq_pool = PooledConnection(GroqBaseURL)
+cohere_pool = PooledConnection(CohereBaseURL)
+
+
+# Groq API wrapper (OpenAI-compatible chat completions) over the shared pool
+class Groq:
+    def __init__(self, api_key=GroqAPIKey, pool=groq_pool):
+        self.api_key = api_key
+        self.pool = pool
+        self.base_url = f"{GroqBaseURL}/chat/completions"
+
+    def chat_completion(self, model, messages, max_tokens=1024, temperature=0.7, top_p=1.0, stream=False):
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+        data = {
+            "model": model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "top_p": top_p,
+            "stream": stream,
+        }
+        if stream:
+            return self._stream_lines(headers, data)
+        response = self.pool.http.post(self.base_url, headers=headers, json=data)
+        response.raise_for_status()
+        return response.json()
+
+    def _stream_lines(self, headers, data):
+        # The response goes back to the pool once the caller stops iterating
+        with self.pool.http.stream("POST", self.base_url, headers=headers, json=data) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                yield line
+
+
+def CohereClient(api_key=CohereAPIkey, pool=cohere_pool):
+    # cohere is a slow import; it is only loaded once a client is needed
+    import cohere
+    return cohere.Client(api_key=api_key, httpx_client=pool.http, timeout=Timeout.read)
+
+
+def WarmUp():
+    # Pre-open connections to every provider in parallel
+    threads = [threading.Thread(target=pool.warm, daemon=True) for pool in (groq_pool, cohere_pool)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def RewarmIfIdle():
+    groq_pool.warm_if_idle()
+    cohere_pool.warm_if_idle()
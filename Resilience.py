@@ -0,0 +1,223 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, wait, FIRST_COMPLETED
+from collections import deque
+from dotenv import dotenv_values
+import threading
+import asyncio
+import random
+import time
+
+env_vars = dotenv_values(".env")
+
+# A duplicate request is fired once the first one is slower than this
+# percentile of recent latencies for the same provider and kind of call
+HedgePercentile = float(env_vars.get("HedgePercentile", 95))
+DefaultHedgeDelay = 2.0
+MinHedgeDelay = 0.25
+MinSamples = 20
+
+executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="Provider")
+
+
+# Per-provider tail-latency statistics and retry budget. Every request adds
+# a fraction of a token to the budget; retries and hedges spend whole
+# tokens, so extra load stays bounded when a provider is struggling.
+class ProviderHealth:
+    def __init__(self, name, window=200, budget=10.0, refill=0.2):
+        self.name = name
+        self.samples = deque(maxlen=window)
+        self.max_tokens = budget
+        self.tokens = budget
+        self.refill = refill
+        self.requests = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failures = 0
+        self.lock = threading.Lock()
+
+    def on_request(self):
+        with self.lock:
+            self.requests += 1
+            self.tokens = min(self.max_tokens, self.tokens + self.refill)
+
+    def try_spend(self):
+        with self.lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def record(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentile(self, p):
+        with self.lock:
+            if len(self.samples) < MinSamples:
+                return None
+            ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def hedge_delay(self):
+        threshold = self.percentile(HedgePercentile)
+        return DefaultHedgeDelay if threshold is None else max(MinHedgeDelay, threshold)
+
+    def report(self):
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failures": self.failures,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+providers = {}
+providers_lock = threading.Lock()
+
+def Health(provider, kind="call"):
+    # Statistics are kept per kind of call: time to first token of a stream
+    # says nothing about how long a full completion takes, and mixing them
+    # would make every completion look slow enough to hedge
+    key = f"{provider}/{kind}"
+    with providers_lock:
+        if key not in providers:
+            providers[key] = ProviderHealth(key)
+        return providers[key]
+
+def Report():
+    with providers_lock:
+        return {name: health.report() for name, health in providers.items()}
+
+
+def Backoff(attempt, base=0.25, cap=4.0):
+    # Full jitter: spreads retries out instead of synchronising them
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def Retryable(error):
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is None:
+        status = getattr(error, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return not isinstance(error, (ValueError, TypeError, KeyError))
+
+
+def _hedged(health, fn):
+    first = executor.submit(fn)
+    try:
+        return first.result(timeout=health.hedge_delay())
+    except FuturesTimeout:
+        pass
+    if not health.try_spend():
+        return first.result()
+
+    health.hedges += 1
+    second = executor.submit(fn)
+    pending = {first, second}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is second:
+                    health.hedge_wins += 1
+                return future.result()
+            error = future.exception()
+    raise error
+
+def Call(provider, fn, attempts=3, hedge=True, kind="call"):
+    # Blocking provider call with a bounded retry budget and hedging.
+    # Long generations should pass hedge=False; a duplicate doubles their cost.
+    health = Health(provider, kind)
+    for attempt in range(attempts):
+        health.on_request()
+        started = time.monotonic()
+        try:
+            result = _hedged(health, fn) if hedge else fn()
+            health.record(time.monotonic() - started)
+            return result
+        except Exception as e:
+            health.failures += 1
+            if attempt + 1 >= attempts or not Retryable(e) or not health.try_spend():
+                raise
+            health.retries += 1
+            print(f"{provider} request failed ({e}), retrying...")
+            time.sleep(Backoff(attempt))
+
+
+async def _first_item(stream):
+    try:
+        return stream, await stream.__anext__()
+    except StopAsyncIteration:
+        return stream, None
+    except BaseException:
+        # Cancelled or failed before the first item: the stream is ours to close
+        await stream.aclose()
+        raise
+
+async def _close(tasks):
+    for task in tasks:
+        task.cancel()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    for result in results:
+        if isinstance(result, tuple):
+            await result[0].aclose()
+
+async def _hedged_first(health, factory):
+    tasks = {asyncio.ensure_future(_first_item(factory()))}
+    hedge = None
+    error = None
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=health.hedge_delay())
+        if not done and health.try_spend():
+            health.hedges += 1
+            hedge = asyncio.ensure_future(_first_item(factory()))
+            tasks.add(hedge)
+
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            winners = [task for task in done if task.exception() is None]
+            if winners:
+                if winners[0] is hedge:
+                    health.hedge_wins += 1
+                for loser in winners[1:]:
+                    await loser.result()[0].aclose()
+                await _close(tasks)
+                return winners[0].result()
+            error = next(iter(done)).exception()
+    except asyncio.CancelledError:
+        # The caller gave up before the first item (a cancelled draft, say);
+        # the open streams would otherwise keep their pooled connections
+        await _close(tasks)
+        raise
+    raise error
+
+async def HedgedStream(provider, factory, attempts=3):
+    # Streaming variant: the race and the retries cover time to first item.
+    # Once an item has been yielded the stream is committed and errors propagate.
+    health = Health(provider, "first token")
+    for attempt in range(attempts):
+        health.on_request()
+        started = time.monotonic()
+        try:
+            stream, first = await _hedged_first(health, factory)
+        except Exception as e:
+            health.failures += 1
+            if attempt + 1 >= attempts or not Retryable(e) or not health.try_spend():
+                raise
+            health.retries += 1
+            print(f"{provider} stream failed ({e}), retrying...")
+            await asyncio.sleep(Backoff(attempt))
+            continue
+        health.record(time.monotonic() - started)
+        if first is None:
+            return
+        yield first
+        async for item in stream:
+            yield item
+        return
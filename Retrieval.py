@@ -0,0 +1,200 @@
+from Backend.Streaming import RunAsync
+from Backend.Providers import HTTP2
+from Backend.ContextBuilder import CountTokens
+from urllib.parse import urlparse
+from dotenv import dotenv_values
+import numpy as np
+import itertools
+import asyncio
+import re
+import httpx
+
+# selectolax is several times faster than BeautifulSoup; bs4 is the fallback
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:
+    HTMLParser = None
+    from bs4 import BeautifulSoup
+
+env_vars = dotenv_values(".env")
+RetrievalPages = int(env_vars.get("RetrievalPages", 4))
+RetrievalTokenBudget = int(env_vars.get("RetrievalTokenBudget", 1200))
+
+useragent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebkit/537.36 (KHTML, like Gecko) Chrome/100.0.4896.75 Safari/537.36'
+PageTimeout = 4.0
+MaxPageBytes = 2 * 1024 * 1024
+PerHostLimit = 2
+PassageWords = 80
+PassageStride = 40
+
+NoiseTags = ["script", "style", "noscript", "nav", "header", "footer", "aside", "form", "svg", "iframe"]
+TextTags = "h1, h2, h3, p, li, blockquote, pre, td"
+Word = re.compile(r"\w+")
+StopWords = {
+    "a", "an", "the", "of", "in", "on", "at", "to", "for", "and", "or", "is", "are", "was", "were",
+    "be", "by", "with", "what", "who", "when", "where", "why", "how", "which", "me", "tell", "about",
+    "do", "does", "did", "it", "this", "that", "i", "you", "can", "please",
+}
+
+
+# Page fetching: one pooled async client, a semaphore per host and a hard
+# deadline per page so one slow site cannot hold up the answer
+class PageFetcher:
+    def __init__(self, per_host=PerHostLimit, timeout=PageTimeout):
+        self.per_host = per_host
+        self.timeout = timeout
+        self.http = None
+        self.hosts = {}
+
+    def client(self):
+        if self.http is None:
+            self.http = httpx.AsyncClient(
+                http2=HTTP2, follow_redirects=True, headers={"User-Agent": useragent},
+                timeout=httpx.Timeout(self.timeout), limits=httpx.Limits(max_connections=20),
+            )
+        return self.http
+
+    async def fetch(self, url):
+        # Any failure costs only this page; the snippets and other pages stand
+        try:
+            host = urlparse(url).netloc
+            semaphore = self.hosts.setdefault(host, asyncio.Semaphore(self.per_host))
+            async with semaphore:
+                return await asyncio.wait_for(self._get(url), self.timeout)
+        except Exception as e:
+            print(f"Skipping {url}: {e.__class__.__name__}")
+            return None
+
+    async def _get(self, url):
+        async with self.client().stream("GET", url) as response:
+            if response.status_code != 200 or "html" not in response.headers.get("content-type", "html"):
+                return None
+            body = bytearray()
+            async for chunk in response.aiter_bytes():
+                body += chunk
+                if len(body) > MaxPageBytes:
+                    break
+            return bytes(body).decode(response.encoding or "utf-8", errors="replace")
+
+    async def fetch_all(self, urls):
+        return await asyncio.gather(*(self.fetch(url) for url in urls))
+
+
+fetcher = PageFetcher()
+
+
+def ExtractText(html):
+    if HTMLParser is not None:
+        tree = HTMLParser(html)
+        for tag in NoiseTags:
+            for node in tree.css(tag):
+                node.decompose()
+        blocks = [node.text(separator=" ", strip=True) for node in tree.css(TextTags)]
+        if not any(blocks) and tree.body is not None:
+            blocks = [tree.body.text(separator=" ", strip=True)]
+    else:
+        soup = BeautifulSoup(html, "html.parser")
+        for node in soup(NoiseTags):
+            node.decompose()
+        blocks = [node.get_text(" ", strip=True) for node in soup.select(TextTags)]
+        if not any(blocks) and soup.body is not None:
+            blocks = [soup.body.get_text(" ", strip=True)]
+    return "\n".join(block for block in blocks if len(block.split()) > 3)
+
+
+def SplitPassages(text, words=PassageWords, stride=PassageStride):
+    tokens = text.split()
+    if len(tokens) <= words:
+        return [" ".join(tokens)] if tokens else []
+    return [" ".join(tokens[i:i + words]) for i in range(0, len(tokens) - stride, stride)]
+
+
+def BM25(query, passages, k1=1.5, b=0.75):
+    # Only query terms contribute to BM25, so the term matrix is passages x query terms
+    terms = np.array(sorted(set(Word.findall(query.lower())) - StopWords))
+    if not len(terms) or not passages:
+        return np.zeros(len(passages))
+    tokenized = [Word.findall(passage.lower()) for passage in passages]
+    lengths = np.array([len(words) for words in tokenized], dtype=np.float32)
+    flat = np.array(list(itertools.chain.from_iterable(tokenized)), dtype=str)
+    tf = np.zeros(len(passages) * len(terms), dtype=np.float32)
+    if len(flat):
+        # Every word is matched against the sorted terms at once and the
+        # hits are counted into (passage, term) cells with one bincount
+        rows = np.repeat(np.arange(len(passages)), lengths.astype(np.int64))
+        columns = np.minimum(np.searchsorted(terms, flat), len(terms) - 1)
+        hit = terms[columns] == flat
+        tf += np.bincount(rows[hit] * len(terms) + columns[hit], minlength=len(tf))
+    tf = tf.reshape(len(passages), len(terms))
+
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((len(passages) - df + 0.5) / (df + 0.5))
+    norm = k1 * (1 - b + b * lengths / max(lengths.mean(), 1.0))
+    return ((tf * (k1 + 1)) / (tf + norm[:, None]) * idf).sum(axis=1)
+
+
+def PackPassages(scored, budget=RetrievalTokenBudget):
+    packed = []
+    used = 0
+    for score, url, passage in scored:
+        if score <= 0:
+            break
+        cost = CountTokens(passage)
+        if used + cost > budget:
+            continue
+        packed.append(f"[{url}] {passage}")
+        used += cost
+    return "\n".join(packed)
+
+
+def RankPassages(query, urls, pages, budget=RetrievalTokenBudget):
+    # Parsing and ranking are CPU-bound; they run on the caller's thread so
+    # the shared event loop keeps streaming tokens and audio meanwhile
+    sources = []
+    passages = []
+    for url, html in zip(urls, pages):
+        if not html:
+            continue
+        for passage in SplitPassages(ExtractText(html)):
+            sources.append(url)
+            passages.append(passage)
+    scores = BM25(query, passages)
+    order = np.argsort(-scores)
+    return PackPassages([(float(scores[i]), sources[i], passages[i]) for i in order], budget)
+
+def RetrievePassages(query, urls, budget=RetrievalTokenBudget):
+    # Blocking entry point; only the fetching runs on the shared event loop
+    urls = urls[:RetrievalPages]
+    pages = RunAsync(fetcher.fetch_all(urls))
+    return RankPassages(query, urls, pages, budget)
+
+
+if __name__ == "__main__":
+    # Runs the retrieval stage against canned pages on a local HTTP server
+    from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+    import threading
+    import tempfile
+    import functools
+    import os
+    import sys
+
+    pages = {
+        "python.html": "<html><body><nav>Home About</nav><p>Python is a high-level programming language "
+                       "created by Guido van Rossum and first released in 1991.</p><p>Its design philosophy "
+                       "emphasizes code readability with significant indentation.</p></body></html>",
+        "cooking.html": "<html><body><p>Boil the pasta for ten minutes in salted water and drain it "
+                        "before adding the sauce.</p></body></html>",
+    }
+    directory = tempfile.mkdtemp()
+    for name, html in pages.items():
+        with open(os.path.join(directory, name), "w", encoding="utf-8") as file:
+            file.write(html)
+    handler = functools.partial(SimpleHTTPRequestHandler, directory=directory)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    query = " ".join(sys.argv[1:]) or "who created the python programming language"
+    urls = [f"{base}/{name}" for name in pages] + [f"{base}/missing.html", "http://[bad"]
+    print(RetrievePassages(query, urls))
+    server.shutdown()
@@ -0,0 +1,172 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+import threading
+import sqlite3
+import time
+import re
+import os
+
+# Freshness tiers: how long a result set stays fresh, picked by query type
+NewsTTL = 10 * 60
+DefaultTTL = 24 * 3600
+ReferenceTTL = 7 * 24 * 3600
+
+NewsWords = re.compile(
+    r"\b(news|latest|today|tonight|current|currently|now|live|breaking|recent|update|updates|"
+    r"score|weather|price|stock|trending|this week|yesterday)\b"
+)
+ReferencePhrases = re.compile(r"^(who (is|was|were)|what (is|are|was)|where is|when (did|was)|history of|define)\b")
+
+
+def NormalizeQuery(query):
+    text = re.sub(r"[^\w\s']", " ", query.lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+def FreshnessTTL(query):
+    text = NormalizeQuery(query)
+    if NewsWords.search(text):
+        return NewsTTL
+    if ReferencePhrases.search(text):
+        return ReferenceTTL
+    return DefaultTTL
+
+
+# Two-tier cache for search results: an in-memory LRU in front of an SQLite
+# table. Expired entries are still served for one more TTL while a
+# background refresh fetches a new copy (stale-while-revalidate).
+class SearchCache:
+    def __init__(self, path=os.path.join("Data", "SearchCache.db"), memory_entries=200):
+        self.memory_entries = memory_entries
+        self.memory = OrderedDict()
+        self.refreshing = set()
+        self.inflight = {}
+        # Prefetched keys and the callback to run when a real lookup uses them
+        self.prefetched = OrderedDict()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.joined = 0
+        self.refreshes = 0
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="SearchCache")
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        with self.db:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT, fetched REAL, ttl REAL)"
+            )
+
+    def lookup(self, key):
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                return self.memory[key]
+            row = self.db.execute("SELECT value, fetched, ttl FROM results WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._remember(key, row)
+            return row
+
+    def store(self, key, value, ttl):
+        entry = (value, time.time(), ttl)
+        with self.lock:
+            self._remember(key, entry)
+            with self.db:
+                self.db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", (key, *entry))
+
+    def _remember(self, key, entry):
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def get_or_fetch(self, query, fetch, prefetching=False):
+        key = NormalizeQuery(query)
+        # A prefetch counts as used only if this lookup is served by it
+        used = (lambda: None) if prefetching else self._take_prefetch(key)
+        entry = self.lookup(key)
+        if entry is not None:
+            value, fetched, ttl = entry
+            age = time.time() - fetched
+            if age <= ttl:
+                self.hits += 1
+                used()
+                return value
+            if age <= 2 * ttl:
+                self.stale_hits += 1
+                self.revalidate(key, query, fetch)
+                used()
+                return value
+
+        # Concurrent misses for the same query share one live fetch
+        with self.lock:
+            future = self.inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self.inflight[key] = Future()
+        if not owner:
+            self.joined += 1
+            value = future.result()
+            used()
+            return value
+
+        self.misses += 1
+        try:
+            value = fetch(query)
+            self.store(key, value, FreshnessTTL(query))
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+
+    def prefetch(self, query, fetch, on_used=None):
+        if on_used is not None:
+            with self.lock:
+                self.prefetched[NormalizeQuery(query)] = on_used
+                while len(self.prefetched) > 20:
+                    self.prefetched.popitem(last=False)
+        return self.executor.submit(self.get_or_fetch, query, fetch, True)
+
+    def forget_prefetch(self, query):
+        with self.lock:
+            self.prefetched.pop(NormalizeQuery(query), None)
+
+    def _take_prefetch(self, key):
+        with self.lock:
+            return self.prefetched.pop(key, None) or (lambda: None)
+
+    def revalidate(self, key, query, fetch):
+        with self.lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+        self.executor.submit(self._refresh, key, query, fetch)
+
+    def _refresh(self, key, query, fetch):
+        try:
+            self.store(key, fetch(query), FreshnessTTL(query))
+            self.refreshes += 1
+        except Exception as e:
+            print(f"Background search refresh failed: {e}")
+        finally:
+            with self.lock:
+                self.refreshing.discard(key)
+
+    def stats(self):
+        total = self.hits + self.stale_hits + self.misses
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "joined": self.joined,
+            "refreshes": self.refreshes,
+            "hit_rate": (self.hits + self.stale_hits) / total if total else 0.0,
+        }
+
+
+search_cache = SearchCache()
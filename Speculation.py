@@ -0,0 +1,136 @@
+from Backend.Chatbot import BuildMessages, ChatParams, Cacheable, is_greeting
+from Backend.AnswerCache import answer_cache
+from Backend.RealtimeSearchEngine import FetchSearchResults, should_search
+from Backend.SearchCache import search_cache, NormalizeQuery
+from Backend.CommandGrammar import ParseCommand
+from Backend.Streaming import StartChat, Publish
+from dotenv import dotenv_values
+import threading
+
+env_vars = dotenv_values(".env")
+SpeculationEnabled = env_vars.get("Speculation", "True").lower() == "true"
+
+CommandVerbs = (
+    "open ", "close ", "play ", "generate ", "create ", "make ", "write ", "search ",
+    "google ", "youtube ", "set ", "remind ", "mute", "unmute", "volume ", "system ",
+)
+
+
+def LooksConversational(query):
+    text = NormalizeQuery(query)
+    return bool(text) and not text.startswith(CommandVerbs) and not should_search(text)
+
+
+# A ChatBot answer generated before FirstLayerDMM has decided that one is
+# needed. Tokens are buffered until the answer is adopted (replayed to the
+# real listener, then forwarded live) or cancelled.
+class SpeculativeAnswer:
+    def __init__(self, query):
+        self.query = query
+        self.tokens = []
+        self.listener = None
+        self.lock = threading.Lock()
+        self.future = StartChat(messages=BuildMessages(query), on_token=self._on_token, publish=False, **ChatParams)
+
+    def _on_token(self, token):
+        with self.lock:
+            self.tokens.append(token)
+            if self.listener:
+                self.listener(token)
+
+    def matches(self, query):
+        return NormalizeQuery(query) == NormalizeQuery(self.query)
+
+    def adopt(self, on_token):
+        stats.draft_used += 1
+
+        def forward(token):
+            on_token(token)
+            Publish(token)
+
+        with self.lock:
+            for token in self.tokens:
+                forward(token)
+            self.listener = forward
+        try:
+            return self.future.result()
+        finally:
+            Publish(None)
+
+    def cancel(self):
+        # Only a draft still generating costs anything to drop
+        if self.future.cancel():
+            stats.draft_cancelled += 1
+        else:
+            stats.draft_unused += 1
+
+
+# Counted where the speculative work is actually used or dropped: a search
+# is useful when the realtime answer reads it from the cache, a draft when
+# ChatBot adopts it. Cancels count only work that was stopped in flight;
+# work that had already finished unused is counted separately.
+class SpeculationStats:
+    def __init__(self):
+        self.searches = 0
+        self.search_used = 0
+        self.search_cancelled = 0
+        self.search_unused = 0
+        self.drafts = 0
+        self.draft_used = 0
+        self.draft_cancelled = 0
+        self.draft_unused = 0
+        self.lock = threading.Lock()
+
+    def search_hit(self):
+        with self.lock:
+            self.search_used += 1
+
+    def report(self):
+        with self.lock:
+            report = {name: value for name, value in vars(self).items() if name != "lock"}
+        report["search_hit_rate"] = self.search_used / self.searches if self.searches else 0.0
+        report["draft_hit_rate"] = self.draft_used / self.drafts if self.drafts else 0.0
+        return report
+
+
+stats = SpeculationStats()
+
+
+# Work started as soon as the query text is known, in parallel with the
+# FirstLayerDMM classification. resolve() keeps what the decision needs.
+class Speculation:
+    def __init__(self, query):
+        self.query = query
+        self.search = None
+        self.draft = None
+        if not SpeculationEnabled or not query or ParseCommand(query):
+            return
+        if should_search(query):
+            self.search = search_cache.prefetch(query, FetchSearchResults, on_used=stats.search_hit)
+            stats.searches += 1
+        elif LooksConversational(query) and not is_greeting(query) and not self.cached(query):
+            self.draft = SpeculativeAnswer(query)
+            stats.drafts += 1
+
+    @staticmethod
+    def cached(query):
+        # No point drafting an answer the answer cache already holds
+        return Cacheable(query) and answer_cache.contains(query)
+
+    def resolve(self, decision):
+        general = [d.removeprefix("general ") for d in decision if d.startswith("general")]
+        realtime = any(d.startswith("realtime") for d in decision)
+
+        if self.search is not None and not realtime:
+            # A search that already started still fills the cache
+            if self.search.cancel():
+                stats.search_cancelled += 1
+            else:
+                stats.search_unused += 1
+            search_cache.forget_prefetch(self.query)
+
+        draft = self.draft
+        if draft is not None and not (not realtime and general and draft.matches(general[0])):
+            draft.cancel()
+            draft = None
+        return draft
@@ -1,11 +1,14 @@
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
 from dotenv import dotenv_values
+from Backend.EventBus import bus
+from Backend.Startup import startup
+from Backend.VoiceActivity import StripWakeWord, WakeWord
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import threading
+import secrets
+import queue
+import hmac
+import json
 import os
-import mtranslate as mt
 
 env_vars = dotenv_values(".env")
 
@@ -23,57 +26,217 @@ HtmlCode = '''<!DOCTYPE html>
     <p id="output"></p>
     <script>
         const output = document.getElementById('output');
-        let recognition;
+        let recognition = null;
 
-        function startRecognition() {
-            recognition = new webkitSpeechRecognition() || new SpeechRecognition();
-            recognition.lang = '';
-            recognition.continuous = true;
+        // Transcripts are pushed to Python as they arrive; nothing polls the page
+        function send(session, text, final) {
+            fetch('/transcript', {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({token: '__TOKEN__', session: session, text: text, final: final})
+            });
+        }
+
+        function startRecognition(id) {
+            // A recognizer left from an earlier session must neither post
+            // under the new id nor restart itself
+            stopRecognition();
+            const session = id || 0;
+            const current = new (window.SpeechRecognition || window.webkitSpeechRecognition)();
+            recognition = current;
+            current.lang = '%s';
+            current.continuous = true;
+            current.interimResults = true;
 
-            recognition.onresult = function(event) {
-                const transcript = event.results[event.results.length - 1][0].transcript;
-                output.textContent += transcript;
+            current.onresult = function(event) {
+                let interim = '';
+                for (let i = event.resultIndex; i < event.results.length; i++) {
+                    const transcript = event.results[i][0].transcript;
+                    if (event.results[i].isFinal) {
+                        output.textContent += transcript;
+                        send(session, output.textContent, true);
+                    } else {
+                        interim += transcript;
+                    }
+                }
+                if (interim) {
+                    send(session, output.textContent + interim, false);
+                }
             };
 
-            recognition.onend = function() {
-                recognition.start();
+            current.onend = function() {
+                if (recognition === current) {
+                    current.start();
+                }
             };
-            recognition.start();
+            current.start();
         }
 
         function stopRecognition() {
-            recognition.stop();
-            output.innerHTML = "";
+            if (recognition) {
+                const previous = recognition;
+                recognition = null;
+                previous.onresult = null;
+                previous.onend = null;
+                previous.stop();
+            }
+            output.textContent = "";
         }
     </script>
 </body>
-</html>'''
+</html>''' % (InputLanguage or "")
+
+
+# Local endpoint the page posts transcripts to. It also serves the page, so
+# the page and the endpoint share an origin. Final results are queued for
+# SpeechRecognition; interim ones go straight to the registered callback.
+# Any web page in the user's browser can reach 127.0.0.1, so a POST must
+# come from the channel's own origin, as JSON, carrying the per-process
+# token embedded in the served page.
+class TranscriptChannel:
+    def __init__(self, page):
+        self.token = secrets.token_hex(16)
+        self.page = page.replace("__TOKEN__", self.token).encode("utf-8")
+        self.finals = queue.Queue()
+        self.on_interim = None
+        self.session = 0
+        self.server = None
+
+    def start(self):
+        if self.server is not None:
+            return
+        channel = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def reject(self, status):
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_GET(self):
+                # A rebound hostname must not be able to read the token
+                if self.headers.get("Host") != channel.host:
+                    return self.reject(403)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(channel.page)))
+                self.end_headers()
+                self.wfile.write(channel.page)
 
-HtmlCode = str(HtmlCode).replace("recognition.lang = ';", f"recognition.lang = '{InputLanguage}';")
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.headers.get("Origin") != channel.origin or self.headers.get("Host") != channel.host:
+                    return self.reject(403)
+                if not self.headers.get("Content-Type", "").startswith("application/json"):
+                    return self.reject(415)
+                try:
+                    event = json.loads(body)
+                except ValueError:
+                    return self.reject(400)
+                if not isinstance(event, dict) or not hmac.compare_digest(str(event.get("token", "")), channel.token):
+                    return self.reject(403)
+                self.send_response(204)
+                self.end_headers()
+                channel.deliver(event)
 
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True, name="TranscriptChannel").start()
 
-with open(r"Data\Voice.html", "w") as f:
-    f.write(HtmlCode)
+    @property
+    def host(self):
+        return f"127.0.0.1:{self.server.server_address[1]}"
 
-current_dir = os.getcwd()
+    @property
+    def origin(self):
+        return f"http://{self.host}"
 
-Link = f"{current_dir}/Data/Voice.html"
+    @property
+    def url(self):
+        return f"{self.origin}/"
+
+    def deliver(self, event):
+        # Results from an earlier session can still arrive after a stop
+        if event.get("session") != self.session or not event.get("text"):
+            return
+        if event.get("final"):
+            self.finals.put(event["text"])
+        elif self.on_interim:
+            try:
+                self.on_interim(event["text"])
+            except Exception as e:
+                print(f"Error in interim transcript callback: {e}")
+
+    def begin(self, on_interim=None):
+        self.session += 1
+        self.on_interim = on_interim
+        while not self.finals.empty():
+            self.finals.get_nowait()
+        return self.session
+
+    def wait(self, timeout=None):
+        return self.finals.get(timeout=timeout)
+
+
+channel = TranscriptChannel(HtmlCode)
 
-chrome_options = Options()
 user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWEbKit/537.36 (KHTML, like Gecko) Chrome/89.0.142.86 Safari/537.36"
-chrome_options.add_argument(f'user-agent={user_agent}')
-chrome_options.add_argument("--use-fake-ui-for-media-stream")
-chrome_options.add_argument("--use-fake-device-for-media-stream")
-chrome_options.add_argument("--headless=new")
+DriverCachePath = os.path.join("Data", "ChromeDriver.json")
 
-service = Service(ChromeDriverManager().install())
-driver = webdriver.Chrome(service=service, options=chrome_options)
+driver = None
+driver_lock = threading.Lock()
 
-TempDirPath = rf"{current_dir}/Frontend/files"
+
+def ChromeDriverPath(refresh=False):
+    # ChromeDriverManager().install() is a network lookup; remember its answer
+    if not refresh:
+        try:
+            with open(DriverCachePath, "r", encoding="utf-8") as file:
+                path = json.load(file)["path"]
+            if os.path.exists(path):
+                return path
+        except (OSError, ValueError, KeyError):
+            pass
+    from webdriver_manager.chrome import ChromeDriverManager
+    path = ChromeDriverManager().install()
+    try:
+        with open(DriverCachePath, "w", encoding="utf-8") as file:
+            json.dump({"path": path}, file)
+    except OSError as e:
+        print(f"Error caching chromedriver path: {e}")
+    return path
+
+def Driver():
+    # Headless Chrome and the transcript channel start on first use, or from
+    # the background warm-up once the window is up
+    global driver
+    with driver_lock:
+        if driver is not None:
+            return driver
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+        from selenium.webdriver.chrome.options import Options
+        from selenium.common.exceptions import WebDriverException
+
+        chrome_options = Options()
+        chrome_options.add_argument(f'user-agent={user_agent}')
+        chrome_options.add_argument("--use-fake-ui-for-media-stream")
+        chrome_options.add_argument("--use-fake-device-for-media-stream")
+        chrome_options.add_argument("--headless=new")
+
+        try:
+            driver = webdriver.Chrome(service=Service(ChromeDriverPath()), options=chrome_options)
+        except WebDriverException:
+            # A cached driver goes stale when Chrome updates itself
+            driver = webdriver.Chrome(service=Service(ChromeDriverPath(refresh=True)), options=chrome_options)
+        channel.start()
+        driver.get(channel.url)
+        return driver
 
 def SetAssistantStatus(Status):
-    with open(rf'{TempDirPath}/Status.data', "w", encoding='utf-8') as file:
-        file.write(Status)
+    bus.publish("status", Status)
 
 def QueryModifier(Query):
     new_query = Query.lower().strip()
@@ -95,32 +258,78 @@ def QueryModifier(Query):
     return new_query.capitalize()
 
 def UniversalTranslator(Text):
+    import mtranslate as mt
     english_translation = mt.translate(Text, "en", "auto")
     return english_translation.capitalize()
 
-def SpeechRecognition():
+# Speech-to-text engines behind SpeechRecognition(). listen() blocks until one
+# utterance has been recognised and returns its raw text; on_interim gets
+# partial hypotheses while the user is still speaking.
+class SpeechBackend:
+    name = "base"
 
-    driver.get("file:///" + Link)
+    def prepare(self):
+        # Optional warm-up: load models, start browsers
+        pass
 
-    driver.find_element(by=By.ID, value="start").click()
+    def listen(self, on_interim=None):
+        raise NotImplementedError
 
-    while True:
+
+# Chrome's webkitSpeechRecognition in headless Selenium (cloud recognition)
+class BrowserBackend(SpeechBackend):
+    name = "browser"
+
+    def prepare(self):
+        Driver()
+
+    def listen(self, on_interim=None):
+        # Blocks on the transcript channel until the page reports a final result
+        driver = Driver()
+        if driver.current_url != channel.url:
+            driver.get(channel.url)
+
+        session = channel.begin(on_interim)
+        driver.execute_script(f"startRecognition({session});")
+        startup.mark("first listen")
         try:
-            Text = driver.find_element(by=By.ID, value="output").text
-            
-            if Text:
+            while True:
+                text = channel.wait()
+                if not WakeWord:
+                    return text
+                # Chrome owns the microphone here, so the wake word can only be
+                # checked on the transcript. Finals accumulate on the page, so
+                # a wake word said alone is picked up with the next sentence.
+                command = StripWakeWord(text, WakeWord)
+                if command:
+                    return command
+        finally:
+            driver.execute_script("stopRecognition();")
 
-                driver.find_element(by=By.ID, value="end").click()
 
-                if InputLanguage.lower() == "en" or "en" in InputLanguage.lower():
-                    return QueryModifier(Text)
-                else:
+SpeechBackendName = env_vars.get("SpeechBackend", "browser").lower()
+backend = None
 
-                    SetAssistantStatus("Translating...")
-                    return QueryModifier(UniversalTranslator(Text))
-                 
-        except Exception as e:
-            pass
+def GetBackend():
+    global backend
+    if backend is None:
+        if SpeechBackendName == "vosk":
+            from Backend.LocalSpeech import VoskBackend
+            backend = VoskBackend()
+        else:
+            backend = BrowserBackend()
+    return backend
+
+def SpeechRecognition(on_interim=None):
+    Text = GetBackend().listen(on_interim)
+    if not Text or not Text.strip():
+        return ""
+
+    if InputLanguage.lower() == "en" or "en" in InputLanguage.lower():
+        return QueryModifier(Text)
+    else:
+        SetAssistantStatus("Translating...")
+        return QueryModifier(UniversalTranslator(Text))
 
 if __name__ == "__main__":
     print("Starting speech recognition...")
@@ -0,0 +1,44 @@
+from contextlib import contextmanager
+import threading
+import time
+
+# Imported first by Main, so this is as close to process start as we get
+ProcessStart = time.perf_counter()
+
+
+# Per-subsystem startup timings plus milestones (window shown, first
+# listen) measured from process start
+class StartupReport:
+    def __init__(self, started=ProcessStart):
+        self.started = started
+        self.timings = {}
+        self.marks = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def timed(self, name):
+        began = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.timings[name] = time.perf_counter() - began
+
+    def mark(self, name):
+        # Only the first occurrence of a milestone counts
+        with self.lock:
+            if name in self.marks:
+                return
+            self.marks[name] = time.perf_counter() - self.started
+        print(f"[startup] {name}: {self.marks[name]:.2f}s")
+
+    def report(self):
+        with self.lock:
+            lines = [f"  {name:<22}{seconds * 1000:8.0f} ms" for name, seconds in self.timings.items()]
+            lines += [f"  {name:<22}{seconds:8.2f} s (since start)" for name, seconds in self.marks.items()]
+        text = "Startup report:\n" + "\n".join(lines)
+        print(text)
+        return text
+
+
+startup = StartupReport()
@@ -0,0 +1,308 @@
+from Backend.Providers import GroqAPIKey, GroqBaseURL, HTTP2, Timeout, Limits, IdleRewarmSeconds
+from Backend.Resilience import HedgedStream
+from dotenv import dotenv_values
+import threading
+import asyncio
+import time
+import json
+import os
+import httpx
+
+# orjson parses straight from bytes and is several times faster when installed
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
+
+env_vars = dotenv_values(".env")
+RecordStreams = env_vars.get("RecordStreams", "False").lower() == "true"
+StreamsDirPath = os.path.join("Data", "Streams")
+
+
+# Incremental Server-Sent Events decoder: feed raw network chunks, get back
+# complete "data:" payloads. Partial lines stay in a bytearray between feeds.
+class SSEDecoder:
+    def __init__(self):
+        self.buffer = bytearray()
+        self.data = []
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        events = []
+        start = 0
+        while True:
+            end = self.buffer.find(b"\n", start)
+            if end == -1:
+                break
+            line = self.buffer[start:end]
+            start = end + 1
+            if line.endswith(b"\r"):
+                line = line[:-1]
+            if not line:
+                if self.data:
+                    events.append(b"\n".join(self.data))
+                    self.data = []
+            elif line.startswith(b"data:"):
+                value = line[6:] if line[5:6] == b" " else line[5:]
+                self.data.append(bytes(value))
+        del self.buffer[:start]
+        return events
+
+
+def ExtractContent(payload):
+    # Returns the delta text of one chat.completion.chunk, or None
+    try:
+        chunk = loads(payload)
+    except ValueError:
+        return None
+    choices = chunk.get("choices")
+    if choices:
+        return choices[0].get("delta", {}).get("content")
+    return None
+
+
+# Token hooks: other stages (GUI, TTS) subscribe to every streamed token.
+# Subscribers get each token as it arrives and None once a stream ends.
+subscribers = []
+
+def Subscribe(callback):
+    subscribers.append(callback)
+    return callback
+
+def Unsubscribe(callback):
+    if callback in subscribers:
+        subscribers.remove(callback)
+
+def PrintToken(token, on_token=None):
+    # Echo to the console and forward to the caller's own hook
+    print(token, end="", flush=True)
+    if on_token:
+        on_token(token)
+
+def Publish(token):
+    for callback in list(subscribers):
+        try:
+            callback(token)
+        except Exception as e:
+            print(f"Error in token subscriber: {e}")
+
+
+class AsyncGroq:
+    def __init__(self, api_key=GroqAPIKey):
+        self.api_key = api_key
+        self.base_url = f"{GroqBaseURL}/chat/completions"
+        self.http = None
+        self.last_used = 0.0
+
+    def client(self):
+        # Created lazily so it binds to the loop that first uses it
+        if self.http is None:
+            self.http = httpx.AsyncClient(http2=HTTP2, timeout=Timeout, limits=Limits)
+        self.last_used = time.monotonic()
+        return self.http
+
+    async def warm(self):
+        try:
+            await self.client().head(GroqBaseURL, timeout=5.0)
+        except httpx.HTTPError as e:
+            print(f"Warm-up failed for {GroqBaseURL}: {e}")
+
+    async def stream_tokens(self, model, messages, max_tokens=1024, temperature=0.7, top_p=1.0):
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+        data = {
+            "model": model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "top_p": top_p,
+            "stream": True,
+        }
+        decoder = SSEDecoder()
+        record = bytearray() if RecordStreams else None
+        done = False
+        async with self.client().stream("POST", self.base_url, headers=headers, json=data) as response:
+            response.raise_for_status()
+            # aiter_bytes, not aiter_raw: a gzip- or br-encoded stream has to be
+            # decompressed before the SSE decoder sees it
+            async for chunk in response.aiter_bytes():
+                if record is not None:
+                    record += chunk
+                for payload in decoder.feed(chunk):
+                    if payload == b"[DONE]":
+                        done = True
+                        break
+                    content = ExtractContent(payload)
+                    if content:
+                        yield content
+                if done:
+                    break
+        if record is not None:
+            SaveRecording(record)
+
+
+def SaveRecording(raw):
+    os.makedirs(StreamsDirPath, exist_ok=True)
+    path = os.path.join(StreamsDirPath, f"{time.time_ns()}.sse")
+    with open(path, "wb") as file:
+        file.write(raw)
+
+
+# One long-lived event loop on a background thread, shared by blocking callers
+_loop = None
+_loop_lock = threading.Lock()
+
+def EventLoop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, daemon=True, name="EventLoop").start()
+    return _loop
+
+def RunAsync(coro):
+    return asyncio.run_coroutine_threadsafe(coro, EventLoop()).result()
+
+
+async_client = AsyncGroq()
+
+async def CollectStream(model, messages, on_token=None, publish=True, **params):
+    parts = []
+    try:
+        # Hedged and retried up to the first token; committed after that
+        stream = HedgedStream("groq", lambda: async_client.stream_tokens(model, messages, **params))
+        async for token in stream:
+            parts.append(token)
+            if on_token:
+                on_token(token)
+            if publish:
+                Publish(token)
+    finally:
+        if publish:
+            Publish(None)
+    return "".join(parts)
+
+def WarmStream(force=False):
+    # Opens (or re-opens after idling) the streaming connection without blocking
+    if force or time.monotonic() - async_client.last_used > IdleRewarmSeconds:
+        asyncio.run_coroutine_threadsafe(async_client.warm(), EventLoop())
+
+def StartChat(model, messages, on_token=None, publish=True, **params):
+    # Non-blocking: returns a concurrent Future that can be awaited or cancelled
+    coro = CollectStream(model, messages, on_token=on_token, publish=publish, **params)
+    return asyncio.run_coroutine_threadsafe(coro, EventLoop())
+
+def StreamChat(model, messages, on_token=None, **params):
+    # Blocking entry point for the pipeline thread
+    return StartChat(model, messages, on_token=on_token, **params).result()
+
+
+# Microbenchmark: current line-based parser vs the incremental decoder
+def LegacyParse(raw):
+    answer = ""
+    for line in raw.decode("utf-8").splitlines():
+        if line.strip():
+            if line.startswith("data: "):
+                line = line[len("data: "):]
+            if line == "[DONE]":
+                break
+            try:
+                chunk = json.loads(line)
+                if "choices" in chunk and chunk["choices"]:
+                    delta = chunk["choices"][0].get("delta", {})
+                    if "content" in delta:
+                        answer += delta["content"]
+            except json.JSONDecodeError:
+                continue
+    return answer
+
+def DecoderParse(raw, chunk_size=512):
+    decoder = SSEDecoder()
+    parts = []
+    for i in range(0, len(raw), chunk_size):
+        for payload in decoder.feed(raw[i:i + chunk_size]):
+            if payload == b"[DONE]":
+                return "".join(parts)
+            content = ExtractContent(payload)
+            if content:
+                parts.append(content)
+    return "".join(parts)
+
+def SyntheticStream(tokens=2000):
+    lines = []
+    for i in range(tokens):
+        chunk = {"id": "chatcmpl-bench", "object": "chat.completion.chunk",
+                 "choices": [{"index": 0, "delta": {"content": f"token{i} "}, "finish_reason": None}]}
+        lines.append(f"data: {json.dumps(chunk)}\n\n")
+    lines.append("data: [DONE]\n\n")
+    return "".join(lines).encode("utf-8")
+
+def Benchmark(paths=None, rounds=20):
+    streams = []
+    for path in paths or []:
+        with open(path, "rb") as file:
+            streams.append(file.read())
+    if not streams:
+        streams = [SyntheticStream()]
+
+    for name, parse in (("legacy", LegacyParse), ("decoder", DecoderParse)):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for raw in streams:
+                parse(raw)
+        elapsed = time.perf_counter() - start
+        print(f"{name:8} {elapsed / rounds * 1000:8.2f} ms per pass over {len(streams)} stream(s)")
+
+    for raw in streams:
+        assert LegacyParse(raw) == DecoderParse(raw), "parsers disagree"
+
+def CheckEncodedStreams(tokens=50):
+    # Serves one synthetic stream plain and gzip-encoded from a local server
+    # and checks stream_tokens yields the same tokens for both
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+    import gzip
+
+    raw = SyntheticStream(tokens)
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            body = gzip.compress(raw) if self.path.endswith("gzip") else raw
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            if self.path.endswith("gzip"):
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = AsyncGroq(api_key="test")
+
+    async def collect(path):
+        client.base_url = f"http://127.0.0.1:{server.server_address[1]}/{path}"
+        return [token async for token in client.stream_tokens("test", [])]
+
+    try:
+        for path in ("plain", "gzip"):
+            result = asyncio.run(collect(path))
+            client.http = None
+            assert len(result) == tokens, f"{path} stream gave {len(result)} of {tokens} tokens"
+        print(f"plain and gzip streams both gave {tokens} tokens")
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    # Run from the directory above the package: python -m Backend.Streaming [recorded .sse files]
+    import sys
+    import glob
+    paths = sys.argv[1:] or glob.glob(os.path.join(StreamsDirPath, "*.sse"))
+    Benchmark(paths)
+    CheckEncodedStreams()
@@ -1,84 +1,163 @@
-import pygame
-import random
-import asyncio
-import edge_tts
+import threading
+import queue
+import re
 import os
 from dotenv import dotenv_values
+from Backend.Streaming import RunAsync
+from Backend.AudioCache import AudioCache
+from Backend.AudioEngine import engine
 
 
 env_vars = dotenv_values(".env")
 AssistantVoice = env_vars.get("AssistantVoice")
-
-async def TextToAudioFile(text) -> None:
-    file_path = r"Data\speech.mp3"
-
-    if os.path.exists(file_path):
-        os.remove(file_path)
-
-    communicate = edge_tts.Communicate(text, AssistantVoice, pitch='+5Hz', rate='+13%')
-    await communicate.save(r'Data\speech.mp3')
+Pitch = '+5Hz'
+Rate = '+13%'
+
+speech_cache = AudioCache(
+    os.path.join("Data", "SpeechCache"),
+    max_disk_bytes=int(env_vars.get("SpeechCacheMB", 64)) * 1024 * 1024,
+    max_memory_bytes=int(env_vars.get("SpeechCacheMemoryMB", 8)) * 1024 * 1024,
+)
+
+async def TextToAudio(text) -> bytes:
+    # Synthesize straight into memory so clips can be produced ahead of playback
+    import edge_tts
+    audio = bytearray()
+    communicate = edge_tts.Communicate(text, AssistantVoice, pitch=Pitch, rate=Rate)
+    async for chunk in communicate.stream():
+        if chunk["type"] == "audio":
+            audio += chunk["data"]
+    return bytes(audio)
+
+def SynthesizeSpeech(text):
+    # Repeated phrases (greetings, goodbyes, stock sentences) skip edge-tts entirely
+    key = AudioCache.key(text, AssistantVoice, Pitch, Rate)
+    audio = speech_cache.get(key)
+    if audio is None:
+        audio = RunAsync(TextToAudio(text))
+        speech_cache.put(key, audio)
+    return audio
 
 def TTS(Text, func=lambda r=None: True):
-    while True:
-        try:
-
-            asyncio.run(TextToAudioFile(Text))
-
-            pygame.mixer.init()
+    try:
+        return engine.play(SynthesizeSpeech(Text))
+    except Exception as e:
+        print(f"Error in TTS: {e}")
+        return False
+    finally:
+        func(False)
+
+# A sentence ends at . ! or ? (plus closing quotes/brackets) followed by whitespace
+SentenceEnd = re.compile(r'[.!?]+["\')\]]*\s+')
+MinSentenceLength = 20
+
+# Speaks a streamed answer sentence by sentence: tokens are cut into sentences,
+# each sentence is synthesized while the next one is still being generated,
+# and finished clips play back to back from a bounded queue.
+class SpeechPipeline:
+    def __init__(self, func=lambda r=None: True, on_start=None, max_clips=3):
+        self.func = func
+        self.on_start = on_start
+        self.pending = ""
+        self.fed = False
+        self.stopped = False
+        self.sentences = queue.Queue()
+        self.clips = queue.Queue(maxsize=max_clips)
+        self.synth_thread = threading.Thread(target=self._synthesize, daemon=True)
+        self.play_thread = threading.Thread(target=self._play, daemon=True)
+        self.synth_thread.start()
+        self.play_thread.start()
+
+    def feed(self, token):
+        if token is None or self.stopped:
+            return
+        self.fed = True
+        self.pending += token
+        start = 0
+        for match in SentenceEnd.finditer(self.pending):
+            if match.end() - start >= MinSentenceLength:
+                self._emit(self.pending[start:match.end()])
+                start = match.end()
+        self.pending = self.pending[start:]
+
+    def flush(self):
+        # Ends the current sentence early, e.g. between two answers
+        self._emit(self.pending)
+        self.pending = ""
+
+    def close(self, fallback=""):
+        # fallback is spoken when nothing was streamed (e.g. canned greetings)
+        if not self.fed and fallback:
+            self.feed(str(fallback))
+        self.flush()
+        self.sentences.put(None)
+
+    def wait(self):
+        self.play_thread.join()
+        return not self.stopped
+
+    def _emit(self, sentence):
+        sentence = sentence.replace("</s>", "").strip()
+        if sentence:
+            self.sentences.put(sentence)
+
+    def _synthesize(self):
+        while True:
+            sentence = self.sentences.get()
+            if sentence is None or self.stopped:
+                break
+            try:
+                self.clips.put(SynthesizeSpeech(sentence))
+            except Exception as e:
+                print(f"Error in TTS: {e}")
+        self.clips.put(None)
 
-            pygame.mixer.music.load(r"Data\speech.mp3")
-            pygame.mixer.music.play()
+    def stop(self):
+        self.stopped = True
+        engine.stop()
 
-            while pygame.mixer.music.get_busy():
-                if func() == False:
+    def _play(self):
+        # Keep one clip queued behind the playing one for gapless hand-off
+        previous = None
+        audio = None
+        try:
+            while True:
+                audio = self.clips.get()
+                if audio is None:
+                    break
+                playback = engine.enqueue(audio)
+                if previous is not None and not previous.wait():
                     break
-                pygame.time.Clock().tick(10)
-                
-            return True 
+                if self.func() == False:
+                    engine.stop()
+                    break
+                playback.started.wait()
+                if self.on_start:
+                    self.on_start()
+                    self.on_start = None
+                previous = playback
+            if previous is not None:
+                previous.wait()
         except Exception as e:
             print(f"Error in TTS: {e}")
-
         finally:
-            try:
-
-                func(False)
-                pygame.mixer.music.stop()
-                pygame.mixer.quit()
-
-            except Exception as e:
-                print(f"Error in finally block: {e}")
+            self.func(False)
+            if audio is not None:
+                # Playback ended early: stop the synthesizer and unblock it
+                self.stopped = True
+                self.sentences.put(None)
+                while self.synth_thread.is_alive():
+                    try:
+                        self.clips.get(timeout=0.1)
+                    except queue.Empty:
+                        pass
 
 def TextToSpeech(Text, func=lambda r=None: True):
-    Data = str(Text).split(".")
-
-    responses = [
-        "The rest of the result has been printed to the chat screen, kindly check it out sir.",
-        "The rest of the text is now on the chat screen, sir, please check it.",
-        "You can see the rest of the text on the chat screen, sir.",
-        "The remaining part of the text is now on the chat screen, sir.",
-        "Sir, you'll find more text on the chat screen for you to see.",
-        "The rest of the answer is now on the chat screen, sir.",
-        "Sir, please look at the chat screen, the rest of the answer is there.",
-        "You'll find the complete answer on the chat screen, sir.",
-        "The next part of the text is on the chat screen, sir.",
-        "Sir, please check the chat screen for more information.",
-        "There's more text on the chat screen for you, sir.",
-        "Sir, take a look at the chat screen for additional text.",
-        "You'll find more to read on the chat screen, sir.",
-        "Sir, check the chat screen for the rest of the text.",
-        "The chat screen has the rest of the text, sir.",
-        "There's more to see on the chat screen, sir, please look.",
-        "Sir, the chat screen holds the continuation of the text.",
-        "You'll find the complete answer on the chat screen, kindly check it out sir.",
-        "Please review the chat screen for the rest of the text, sir.",
-        "Sir, look at the chat screen for the complete answer."
-    ]
-
-    if len(Data) > 4 and len(Text) >= 250:
-       TTS(" ".join(Text.split(".")[0:2]) + ". " + random.choice(responses), func)
-
-    else:
-        TTS(Text, func)
+    # Long answers are spoken in full; the first sentence starts playing
+    # while the rest is still being synthesized
+    pipeline = SpeechPipeline(func)
+    pipeline.close(fallback=Text)
+    return pipeline.wait()
 
 if __name__ == "__main__":
     while True:
@@ -0,0 +1,145 @@
+from dotenv import dotenv_values
+import numpy as np
+import collections
+
+env_vars = dotenv_values(".env")
+# Gate recognition on detected speech; an optional wake word has to open each query
+VoiceGate = (env_vars.get("VoiceGate") or "true").lower() in ("1", "true", "yes", "on")
+WakeWord = (env_vars.get("WakeWord") or "").strip().lower()
+# Trailing silence that ends an utterance, and how far above the noise floor speech must be
+EndpointMs = int(env_vars.get("EndpointMs") or 700)
+VadMargin = float(env_vars.get("VadMargin") or 10.0)
+
+
+def FrameLevels(chunk, sample_rate=16000, frame_ms=10):
+    # Level of each 10 ms frame of a 16-bit PCM chunk, in dBFS
+    samples = np.frombuffer(chunk, dtype=np.int16).astype(np.float32) / 32768.0
+    size = max(1, sample_rate * frame_ms // 1000)
+    count = len(samples) // size
+    if count == 0:
+        return np.empty(0, dtype=np.float32)
+    frames = samples[:count * size].reshape(count, size)
+    return 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+
+
+# Energy voice activity detector with an adaptive noise floor. A chunk is
+# speech when enough of its frames are VadMargin dB above the floor. The
+# floor follows quiet frames down quickly and up slowly, so a burst of
+# speech doesn't drag it along.
+class EnergyVAD:
+    def __init__(self, sample_rate=16000, margin=VadMargin, min_level=-50.0, voiced_fraction=0.3):
+        self.sample_rate = sample_rate
+        self.margin = margin
+        self.min_level = min_level
+        self.voiced_fraction = voiced_fraction
+        self.noise = None
+
+    def threshold(self):
+        return max(self.noise + self.margin, self.min_level)
+
+    def is_speech(self, chunk):
+        levels = FrameLevels(chunk, self.sample_rate)
+        if not len(levels):
+            return False
+        if self.noise is None:
+            self.noise = float(np.median(levels))
+        voiced = levels > self.threshold()
+        quiet = levels[~voiced]
+        if len(quiet):
+            level = float(np.median(quiet))
+            rate = 0.3 if level < self.noise else 0.02
+            self.noise += (level - self.noise) * rate
+        return voiced.mean() >= self.voiced_fraction
+
+
+# Splits a chunk stream into utterances. wait() consumes audio until speech
+# has lasted start_ms and returns it with a little pre-roll; utterance()
+# then yields live chunks until end_ms of trailing silence or max_ms.
+# Nothing downstream sees the audio in between.
+class Endpointer:
+    def __init__(self, source, chunk_ms=100, vad=None, sample_rate=16000,
+                 start_ms=200, end_ms=EndpointMs, preroll_ms=300, max_ms=15000):
+        self.source = iter(source)
+        self.chunk_ms = chunk_ms
+        self.vad = vad or EnergyVAD(sample_rate)
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.max_ms = max_ms
+        self.preroll = collections.deque(maxlen=max(1, preroll_ms // chunk_ms))
+
+    def wait(self, limit_ms=None):
+        # Speech onset with pre-roll, or None if the source ends or limit_ms passes first
+        onset = []
+        waited = 0
+        for chunk in self.source:
+            if self.vad.is_speech(chunk):
+                onset.append(chunk)
+                if len(onset) * self.chunk_ms >= self.start_ms:
+                    head = list(self.preroll) + onset
+                    self.preroll.clear()
+                    return head
+                continue
+            self.preroll.extend(onset)
+            self.preroll.append(chunk)
+            onset = []
+            waited += self.chunk_ms
+            if limit_ms is not None and waited >= limit_ms:
+                return None
+        return None
+
+    def utterance(self, head):
+        yield from head
+        length = len(head) * self.chunk_ms
+        silence = 0
+        for chunk in self.source:
+            yield chunk
+            length += self.chunk_ms
+            silence = 0 if self.vad.is_speech(chunk) else silence + self.chunk_ms
+            if silence >= self.end_ms or length >= self.max_ms:
+                return
+
+    def utterances(self):
+        # Each utterance must be consumed before asking for the next one
+        while True:
+            head = self.wait()
+            if head is None:
+                return
+            yield self.utterance(head)
+
+
+def StripWakeWord(text, word=WakeWord):
+    # What follows the wake word, "" if it was said alone, None if it wasn't said
+    words = text.lower().split()
+    key = word.split()
+    for i in range(len(words) - len(key) + 1):
+        if [w.strip(",.!?") for w in words[i:i + len(key)]] == key:
+            return " ".join(text.split()[i + len(key):]).lstrip(",.!? ")
+    return None
+
+
+if __name__ == "__main__":
+    # Prints the utterances the endpointer finds in a WAV file, for tuning
+    import sys
+    from Backend.LocalSpeech import WavFrames, WavInfo, ChunkMs
+
+    sample_rate, duration = WavInfo(sys.argv[1])
+    consumed = [0]
+
+    def counted():
+        for chunk in WavFrames(sys.argv[1]):
+            consumed[0] += 1
+            yield chunk
+
+    endpointer = Endpointer(counted(), ChunkMs, sample_rate=sample_rate)
+    speech = 0.0
+    while True:
+        head = endpointer.wait()
+        if head is None:
+            break
+        start = (consumed[0] - len(head)) * ChunkMs / 1000
+        for _ in endpointer.utterance(head):
+            pass
+        end = consumed[0] * ChunkMs / 1000
+        speech += end - start
+        print(f"speech {start:6.2f}s - {end:6.2f}s")
+    print(f"{duration:.1f}s audio, {speech:.1f}s passed to the recognizer")